@@ -4,13 +4,18 @@
 import numpy as np
 
 EPS = 1e-12  # must match your DSP
-Xtr = np.load("src/training.npy").astype(np.float32)
-Xsrc = np.log10(np.maximum(Xtr, EPS))
+# log10(max(Xtr, EPS)) in place on one float32 copy (no full-size temporaries)
+Xsrc = np.load("src/training.npy").astype(np.float32)
+np.maximum(Xsrc, EPS, out=Xsrc)
+np.log10(Xsrc, out=Xsrc)
 
 MEAN = np.load("src/ei_scaler_mean.npy").astype(np.float32)
 STD  = np.load("src/ei_scaler_std.npy").astype(np.float32)
 STD_SAFE = np.where(STD == 0.0, 1.0, STD)
 
+# Row-standardized training features: Pearson r vs a standardized x is then one mat-vec
+Xn = (Xsrc - Xsrc.mean(axis=1, keepdims=True)) / Xsrc.std(axis=1, keepdims=True)
+
 def diagnose_runtime_vector(features_log10: np.ndarray):
     x = np.asarray(features_log10, dtype=np.float32).ravel()
     assert x.size == MEAN.size, f"Feature length {x.size} != scaler {MEAN.size}"
@@ -19,14 +24,17 @@ def diagnose_runtime_vector(features_log10: np.ndarray):
     print(f"[Z] min/mean/max: {z.min():.3f} / {z.mean():.3f} / {z.max():.3f}")
 
     # Correlation with EI training rows (same space, same order expected)
+    x_n = (x - x.mean()) / x.std()
+    corrs = Xn @ x_n / x_n.size
     for i in (0, len(Xsrc)//3, (2*len(Xsrc))//3):
-        print(f"[corr vs train {i}]: {np.corrcoef(x, Xsrc[i])[0,1]:.3f}")
+        print(f"[corr vs train {i}]: {corrs[i]:.3f}")
 
     # If this is high but the line above is low → ORDER mismatch (same distribution, shuffled order)
     print(f"[corr sorted↔sorted]: {np.corrcoef(np.sort(x), np.sort(Xsrc[0]))[0,1]:.3f}")
 
     # Show the 10 worst-matching indices to locate the offending block(s)
-    bad = np.argsort(z)[:10]
+    bad = np.argpartition(z, 10)[:10]   # O(N) select, then order just those 10
+    bad = bad[np.argsort(z[bad])]
     print("Worst Z indices:", list(map(int, bad)))
     print("Worst Z values :", [float(z[i]) for i in bad])
 
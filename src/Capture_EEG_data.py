@@ -3,7 +3,6 @@
 
 import os
 import time
-import csv
 from datetime import datetime
 
 import numpy as np
@@ -62,7 +61,10 @@ def record_label(board: BoardShim, label: str, duration_sec: int) -> np.ndarray:
     print(f"[INFO] Recording label='{label}' for {duration_sec} s...")
     t_start = time.time()
 
-    all_rows = []
+    # Preallocate for the whole recording (+25 % headroom) and fill with a write cursor
+    cap = int(fs * duration_sec * 1.25)
+    buf = np.empty((cap, 1 + len(eeg_channels)), dtype=np.float64)
+    cur = 0
 
     while True:
         now = time.time()
@@ -81,30 +83,35 @@ def record_label(board: BoardShim, label: str, duration_sec: int) -> np.ndarray:
             continue
 
         num_samples = eeg_data.shape[1]
+        if cur + num_samples > buf.shape[0]:
+            # More data than expected (e.g. backlog from start-up): grow the buffer
+            extra = max(buf.shape[0], num_samples)
+            buf = np.concatenate([buf, np.empty((extra, buf.shape[1]), dtype=buf.dtype)])
+
         # Generate timestamps relative to t_start for these samples
         # Approximate: assume uniform sampling at fs
         t_end_block = now
         t_start_block = t_end_block - (num_samples / fs)
-        ts = np.linspace(
+        block = buf[cur:cur + num_samples]
+        block[:, 0] = np.linspace(
             t_start_block - t_start,
             t_end_block - t_start,
             num_samples,
             endpoint=False,
         )
 
-        # Stack: t, ch1..ch4 (Muse 2: 4 EEG channels in eeg_channels order)
-        # transpose to rows
-        block = np.column_stack([ts, eeg_data.T])
-        all_rows.append(block)
+        # Columns: t, ch1..ch4 (Muse 2: 4 EEG channels in eeg_channels order)
+        block[:, 1:] = eeg_data.T
+        cur += num_samples
 
         # tiny sleep to avoid hammering
         time.sleep(0.02)
 
-    if not all_rows:
+    if cur == 0:
         print("[WARN] No data captured for this recording.")
         return np.empty((0, 5))
 
-    full = np.vstack(all_rows)
+    full = buf[:cur]
 
     # Sort by time just in case (should already be ordered)
     full = full[full[:, 0].argsort()]
@@ -128,13 +135,14 @@ def save_csv(data: np.ndarray, label: str) -> str:
     filename = f"{label}.{ts}.csv"
     path = os.path.join(OUTPUT_DIR, filename)
 
-    header = ["timestamp_s", "eeg_1", "eeg_2", "eeg_3", "eeg_4"]
+    header = "timestamp_s,eeg_1,eeg_2,eeg_3,eeg_4\n"
+    row_fmt = ",".join(["%.6f"] * data.shape[1]) + "\n"
 
-    with open(path, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(header)
-        for row in data:
-            writer.writerow([f"{row[0]:.6f}"] + [f"{v:.6f}" for v in row[1:]])
+    # 1 MiB write buffer: the ~23k rows of a long recording go out in a few large writes.
+    # tolist() unboxes all samples in one C pass; each row is then a single % format.
+    with open(path, "w", newline="", buffering=1 << 20) as f:
+        f.write(header)
+        f.writelines(row_fmt % tuple(row) for row in data.tolist())
 
     print(f"[INFO] Saved {path}")
     return path
@@ -1,7 +1,12 @@
 # EEG-controlled blower bridge: streams Muse EEG, applies EI-style spectral features, runs TFLite model, and sends stable TARGET/NOT decisions; 2025-11-11 20:40, Thomas Vikström
 
+import math
+import os
+import threading
 import time
+from queue import Empty, Full, Queue
 import numpy as np
+from scipy.fft import rfft, rfftfreq
 import serial
 from serial import SerialException
 from brainflow.board_shim import (
@@ -26,16 +31,49 @@ except ImportError:
     Interpreter = tf.lite.Interpreter
     TFLITE_BACKEND = "tensorflow"
 
-# Load your model (filename must match your exported file)
-interpreter = Interpreter(model_path="EEG_float32.lite")
+# Numba is optional: JIT the per-window element-wise passes when available
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# pyFFTW is optional: plan the fixed-shape rFFT once and reuse it every window
+try:
+    import pyfftw
+    PYFFTW_AVAILABLE = True
+except ImportError:
+    PYFFTW_AVAILABLE = False
+
+# Load your model (filename must match your exported file).
+# An int8 model made with convert_model.py --quant int8 is preferred when present.
+MODEL_INT8 = "EEG_int8.lite"
+MODEL_FLOAT32 = "EEG_float32.lite"
+MODEL_PATH = MODEL_INT8 if os.path.exists(MODEL_INT8) else MODEL_FLOAT32
+# XNNPACK is the default CPU delegate in tflite-runtime/TF >= 2.10; give it up to 4 threads
+TFLITE_NUM_THREADS = min(4, os.cpu_count() or 1)
+
+interpreter = Interpreter(model_path=MODEL_PATH, num_threads=TFLITE_NUM_THREADS)
 interpreter.allocate_tensors()
 input_details = interpreter.get_input_details()
 output_details = interpreter.get_output_details()
 
+# Quantized models take/return integers; (scale, zero_point) map them to/from float
+INPUT_QUANTIZED = input_details[0]["dtype"] != np.float32
+OUTPUT_QUANTIZED = output_details[0]["dtype"] != np.float32
+IN_SCALE, IN_ZERO = input_details[0]["quantization"]
+OUT_SCALE, OUT_ZERO = output_details[0]["quantization"]
+print(
+    f"[INFO] Using TFLite model {MODEL_PATH} ({TFLITE_BACKEND}), "
+    f"input dtype: {input_details[0]['dtype'].__name__}, threads: {TFLITE_NUM_THREADS}"
+)
+
 # ========= CONFIG =========
 
 # --- Muse / BrainFlow ---
 BOARD_ID = BoardIds.MUSE_2_BOARD.value
+EEG_CHANNELS = BoardShim.get_eeg_channels(BOARD_ID)   # constant per board, query once
+FS = BoardShim.get_sampling_rate(BOARD_ID)
 WINDOW_SECONDS = 2.0                    # EEG window length (s)
 DECISION_INTERVAL = 0.2                 # How often we decide (s)
 STABILITY_WINDOWS = 3                   # Require N consecutive TARGETs for stable=TRUE
@@ -49,14 +87,96 @@ TARGET_THRESHOLD = 0.7                  # p_TARGET >= this -> TARGET
 SERIAL_ENABLED = True
 SERIAL_PORT = "COM5"
 SERIAL_BAUD = 115200
+HEARTBEAT_SEC = 5.0                     # resend an unchanged decision at most this often
 
 # Debug controls
 DEBUG_FEATURES_EVERY_N = 10             # print feature stats every N windows
 DEBUG_RAW_OUTPUT_EVERY_N = 10           # print raw model output vector every N windows
 DEBUG_MAX_WINDOWS = 60                  # more verbose during first N windows
 
+# Spectral front-end (fixed 4 x 512 window, see ei_spectral_features)
+N_FFT = 512
+NEEDED = int(WINDOW_SECONDS * FS)       # samples per window (512 @ 256 Hz)
+HANN = np.hanning(N_FFT).astype(np.float32)
+FREQS = rfftfreq(N_FFT, d=1.0 / FS)
+BAND_MASK = FREQS <= 66.0               # 133 bins from 0..66 Hz inclusive
+BAND_IDX = np.nonzero(BAND_MASK)[0].astype(np.int32)
+
 # ==========================
 
+_expected_size = int(np.prod(input_details[0]["shape"]))
+if 4 * BAND_IDX.size != _expected_size:
+    raise ValueError(
+        f"Feature size {4 * BAND_IDX.size} does not match model input size {_expected_size}."
+    )
+
+# FFTW plan specialised for the (4, N_FFT) float32 window. Planning with
+# FFTW_MEASURE is slow and clobbers the arrays, so it is done once at startup;
+# ei_spectral_features then only fills _FFT_IN and executes the plan.
+if PYFFTW_AVAILABLE:
+    _FFT_IN = pyfftw.empty_aligned((4, N_FFT), dtype="float32")
+    _FFT_OUT = pyfftw.empty_aligned((4, N_FFT // 2 + 1), dtype="complex64")
+    _FFT_PLAN = pyfftw.FFTW(
+        _FFT_IN,
+        _FFT_OUT,
+        axes=(1,),
+        flags=("FFTW_MEASURE", "FFTW_DESTROY_INPUT"),
+        threads=min(4, os.cpu_count() or 1),
+    )
+    print("[INFO] Using pyFFTW plan for the spectral front-end.")
+
+
+# ========= DSP KERNELS =========
+
+if NUMBA_AVAILABLE:
+
+    @njit(cache=True, fastmath=True)
+    def _prep(w, hann):
+        """In place: demean, normalize by std (if std > 0) and Hann-window each channel."""
+        ch, n = w.shape
+        for c in range(ch):
+            mean = 0.0
+            for i in range(n):
+                mean += w[c, i]
+            mean /= n
+            var = 0.0
+            for i in range(n):
+                d = w[c, i] - mean
+                w[c, i] = d
+                var += d * d
+            std = math.sqrt(var / n)
+            scale = 1.0 / std if std > 1e-9 else 1.0
+            for i in range(n):
+                w[c, i] = w[c, i] * scale * hann[i]
+
+    @njit(cache=True, fastmath=True)
+    def _finalize(spec, band_idx, out):
+        """log10(|spec|^2) of the band bins, channel-major into flat `out`."""
+        nb = band_idx.size
+        for c in range(spec.shape[0]):
+            for k in range(nb):
+                z = spec[c, band_idx[k]]
+                out[c * nb + k] = math.log10(z.real * z.real + z.imag * z.imag + 1e-12)
+
+else:
+
+    def _prep(w, hann):
+        """In place: demean, normalize by std (if std > 0) and Hann-window each channel."""
+        inv_n = np.float32(1.0 / w.shape[1])
+        w -= w.sum(axis=1, keepdims=True, dtype=np.float32) * inv_n
+        std = np.sqrt(np.einsum("ij,ij->i", w, w)[:, None] * inv_n)
+        np.divide(w, np.where(std > 1e-9, std, 1.0), out=w)
+        w *= hann
+
+    def _finalize(spec, band_idx, out):
+        """log10(|spec|^2) of the band bins, channel-major into flat `out`."""
+        band = spec[:, band_idx]
+        power = out.reshape(spec.shape[0], -1)
+        np.multiply(band.real, band.real, out=power)
+        power += band.imag * band.imag
+        power += 1e-12
+        np.log10(power, out=power)
+
 
 def init_board() -> BoardShim:
     """Initialize Muse 2 via BrainFlow."""
@@ -73,9 +193,7 @@ def init_board() -> BoardShim:
     print("[INFO] Starting Muse stream...")
     board.start_stream(45000)
 
-    eeg_channels = BoardShim.get_eeg_channels(BOARD_ID)
-    fs = BoardShim.get_sampling_rate(BOARD_ID)
-    print(f"[INFO] EEG channels: {eeg_channels}, sampling rate: {fs} Hz")
+    print(f"[INFO] EEG channels: {EEG_CHANNELS}, sampling rate: {FS} Hz")
 
     time.sleep(1.0)  # Let buffer fill a bit
     return board
@@ -97,31 +215,26 @@ def init_serial():
         return None
 
 
-def get_eeg_window(board: BoardShim, window_sec: float) -> np.ndarray | None:
+def get_eeg_window(board: BoardShim) -> np.ndarray | None:
     """
-    Grab the most recent EEG window.
-    Returns array shape (n_channels, n_samples) or None if insufficient data.
+    Grab the most recent EEG window (WINDOW_SECONDS long).
+    Returns array shape (n_channels, NEEDED) or None if insufficient data.
     """
-    fs = BoardShim.get_sampling_rate(BOARD_ID)
-    needed = int(window_sec * fs)
-
-    data = board.get_current_board_data(needed)
-    if data.shape[1] < needed:
+    data = board.get_current_board_data(NEEDED)
+    if data.shape[1] < NEEDED:
         return None
 
-    eeg_channels = BoardShim.get_eeg_channels(BOARD_ID)
-    window = data[eeg_channels, -needed:]
+    # float64 from BrainFlow; the caller copies it into its float32 window buffer
+    return data[EEG_CHANNELS, -NEEDED:]
 
-    return window
 
-
-def ei_spectral_features(window: np.ndarray) -> np.ndarray:
+def ei_spectral_features(window: np.ndarray, out: np.ndarray) -> np.ndarray:
     """
     Spectral features designed to match 1 x 532 input:
 
     - Muse: 4 EEG channels.
     - 2.0 s @ 256 Hz → 512 samples per channel.
-    - For each of 4 channels:
+    - For all 4 channels at once (one batched rFFT):
         * Take last 512 samples.
         * Demean and normalize by std (if std > 0).
         * Hann window.
@@ -129,6 +242,11 @@ def ei_spectral_features(window: np.ndarray) -> np.ndarray:
         * Keep bins where freq <= 66 Hz → 133 bins.
         * Use log10(power).
     - 4 * 133 = 532 features.
+
+    With pyFFTW the window is copied into the planned aligned input buffer.
+    Otherwise a C-contiguous (4, 512) float32 `window` is used as scratch and
+    overwritten in place (no copy); anything else is copied first. Features are written
+    into `out` (532 float32), which is also returned.
     """
     window = np.asarray(window)
 
@@ -141,52 +259,41 @@ def ei_spectral_features(window: np.ndarray) -> np.ndarray:
 
     if ch < 4:
         raise ValueError(f"Expected at least 4 EEG channels, got {ch}")
-    if n < 512:
-        raise ValueError(f"Expected at least 512 samples, got {n}")
-
-    # Use first 4 channels, last 512 samples
-    window = window[:4, -512:]
-    ch, n = window.shape
-
-    fs = 256.0
-    n_fft = 512
-
-    if n != n_fft:
-        raise ValueError(f"Internal error: expected 512 samples, got {n}")
-
-    hann = np.hanning(n_fft)
-    freqs = np.fft.rfftfreq(n_fft, d=1.0 / fs)
-    band_mask = freqs <= 66.0  # 133 bins from 0..66 Hz inclusive
-
-    feats = []
-
-    for c in range(ch):
-        x = window[c, :]
+    if n < N_FFT:
+        raise ValueError(f"Expected at least {N_FFT} samples, got {n}")
+
+    # Use first 4 channels, last N_FFT samples
+    if PYFFTW_AVAILABLE:
+        # Prepare straight into the planned (aligned) input and run the FFTW plan
+        np.copyto(_FFT_IN, window[:4, -N_FFT:])
+        _prep(_FFT_IN, HANN)
+        _FFT_PLAN.execute()
+        spec = _FFT_OUT
+    else:
+        w = window[:4, -N_FFT:]
+        if w.dtype != np.float32 or not w.flags.c_contiguous:
+            w = np.ascontiguousarray(w, dtype=np.float32)
 
-        # Remove DC and normalize variance
-        x = x - np.mean(x)
-        std = np.std(x)
-        if std > 1e-9:
-            x = x / std
+        _prep(w, HANN)
+        # float32 in -> single-precision pocketfft path; 512 is already a fast length
+        spec = rfft(w, n=N_FFT, axis=1, workers=-1)
 
-        x = x * hann
-        spec = np.fft.rfft(x, n=n_fft)
-        power = np.abs(spec) ** 2
+    _finalize(spec, BAND_IDX, out)
 
-        p_band = power[band_mask]
-        p_log = np.log10(p_band + 1e-12)
+    return out
 
-        feats.extend(p_log.tolist())
 
-    feats = np.array(feats, dtype=np.float32)
+def quantize_features(feats: np.ndarray, out: np.ndarray):
+    """Quantize float features into an integer model input buffer (in place)."""
+    info = np.iinfo(out.dtype)
+    q = np.rint(feats / IN_SCALE + IN_ZERO)
+    np.clip(q, info.min, info.max, out=q)
+    np.copyto(out.reshape(-1), q, casting="unsafe")
 
-    expected_size = int(np.prod(input_details[0]["shape"]))
-    if feats.size != expected_size:
-        raise ValueError(
-            f"Feature size {feats.size} does not match model input size {expected_size}."
-        )
 
-    return feats
+def dequantize_output(y: np.ndarray) -> np.ndarray:
+    """Map integer model output back to float probabilities."""
+    return (y.astype(np.float32) - OUT_ZERO) * OUT_SCALE
 
 
 def send_decision(ser, is_target: bool):
@@ -221,96 +328,186 @@ def debug_window_and_features(window: np.ndarray, features: np.ndarray, idx: int
     )
 
 
+def capture_loop(board: BoardShim, win_q: Queue, stop: threading.Event):
+    """Capture thread: publish the freshest EEG window every DECISION_INTERVAL."""
+    try:
+        while not stop.is_set():
+            window = get_eeg_window(board)
+
+            if window is None:
+                print("[TRACE] Not enough data yet for full window.")
+            else:
+                # Only the newest window matters: drop one the worker hasn't picked up yet
+                try:
+                    win_q.get_nowait()
+                except Empty:
+                    pass
+                win_q.put_nowait(window)
+
+            time.sleep(DECISION_INTERVAL)
+    except BrainFlowError as e:
+        print(f"[ERROR] BrainFlow error: {e}")
+        stop.set()
+    except Exception as e:
+        # Anything else would end this thread silently and leave the others waiting
+        # on empty queues forever: report it and shut the whole pipeline down
+        print(f"[ERROR] Capture thread failed: {e!r}")
+        stop.set()
+
+
+def inference_loop(win_q: Queue, out_q: Queue, stop: threading.Event):
+    """
+    Worker thread: features → TFLite inference → decision logic.
+    Owns the interpreter and all per-window buffers, so no locking is needed.
+    """
+    # Per-window buffers, allocated once and reused by every iteration
+    window_buf = None if PYFFTW_AVAILABLE else np.empty((4, N_FFT), dtype=np.float32)
+    feats_buf = np.empty(4 * BAND_IDX.size, dtype=np.float32) if INPUT_QUANTIZED else None
+
+    # Callable returning a live view of the interpreter's input tensor. Only the
+    # callable is kept: invoke() refuses to run while such a view is referenced.
+    input_tensor = interpreter.tensor(input_details[0]["index"])
+
+    decisions: list[bool] = []
+    window_idx = 0
+
+    while not stop.is_set():
+        try:
+            window = win_q.get(timeout=0.5)
+        except Empty:
+            continue
+
+        try:
+            # 1) Features (window_buf is overwritten as FFT scratch), written
+            #    straight into the input tensor on the float path — no set_tensor copy
+            if PYFFTW_AVAILABLE:
+                src = window  # copied into the FFTW input buffer
+            else:
+                np.copyto(window_buf, window[:4, -N_FFT:])
+                src = window_buf
+            x = input_tensor().reshape(-1)
+            if INPUT_QUANTIZED:
+                feats = ei_spectral_features(src, feats_buf)
+                quantize_features(feats, x)
+            else:
+                feats = ei_spectral_features(src, x)
+
+            # Optional debug of raw signal + features
+            if window_idx < DEBUG_MAX_WINDOWS and (window_idx % DEBUG_FEATURES_EVERY_N == 0):
+                debug_window_and_features(window, feats, window_idx)
+
+            # 2) Inference (drop the tensor views first)
+            del x, feats
+            interpreter.invoke()
+            y = interpreter.get_tensor(output_details[0]["index"])[0]
+            if OUTPUT_QUANTIZED:
+                y = dequantize_output(y)
+
+            # Optional debug of raw model output
+            if window_idx < DEBUG_MAX_WINDOWS and (window_idx % DEBUG_RAW_OUTPUT_EVERY_N == 0):
+                y_str = ", ".join(f"{v:.3f}" for v in y)
+                print(f"[DEBUG] raw model output: [{y_str}]")
+
+            probs = {}
+            for i, label in enumerate(LABELS):
+                if i < len(y):
+                    probs[label] = float(y[i])
+
+            if TARGET_CLASS_INDEX < len(y):
+                p_target = float(y[TARGET_CLASS_INDEX])
+            else:
+                p_target = float(max(y))
+
+        except Exception as e:
+            print(f"[WARN] Inference error, skipping this window: {e}")
+            window_idx += 1
+            continue
+
+        # 3) Decision logic
+        is_target = p_target >= TARGET_THRESHOLD
+
+        decisions.append(is_target)
+        if len(decisions) > STABILITY_WINDOWS:
+            decisions = decisions[-STABILITY_WINDOWS:]
+
+        stable_target = all(decisions)
+
+        calm_p = probs.get("calm", 0.0)
+        non_calm_p = probs.get("non_calm", 0.0)
+        sleep_p = probs.get("sleep", 0.0)
+
+        print(
+            f"p_target={p_target:0.3f} "
+            f"(calm={calm_p:0.2f}, non_calm={non_calm_p:0.2f}, sleep={sleep_p:0.2f}) | "
+            f"last {len(decisions)}: {''.join('T' if d else 'N' for d in decisions)} | "
+            f"stable_target={stable_target}"
+        )
+
+        try:
+            out_q.put_nowait(stable_target)
+        except Full:
+            pass  # serial side is stalled; drop rather than block inference
+
+        window_idx += 1
+
+
+def serial_loop(ser, out_q: Queue, stop: threading.Event):
+    """
+    Serial thread: forward decisions so a blocking UART write never delays inference.
+    Only transitions are sent, plus a heartbeat every HEARTBEAT_SEC so the Photon 2
+    can tell a steady decision from a dead link.
+    """
+    last_sent = None
+    last_sent_t = 0.0
+    while not stop.is_set():
+        try:
+            stable_target = out_q.get(timeout=0.5)
+        except Empty:
+            continue
+        now = time.monotonic()
+        if stable_target != last_sent or now - last_sent_t >= HEARTBEAT_SEC:
+            send_decision(ser, stable_target)
+            last_sent = stable_target
+            last_sent_t = now
+
+
 def main():
     board = None
     ser = None
+    stop = threading.Event()
+    threads: list[threading.Thread] = []
 
     try:
         board = init_board()
         ser = init_serial()
 
-        decisions: list[bool] = []
-
         print("[INFO] Entering main EEG → decision loop.")
         print("[INFO] Move/blink/relax etc. and watch probabilities.\n")
         print(f"[DEBUG] Model input shape: {input_details[0]['shape']}")
         print(f"[DEBUG] Model output shape: {output_details[0]['shape']}")
 
-        window_idx = 0
-
-        while True:
-            window = get_eeg_window(board, WINDOW_SECONDS)
+        # capture → (freshest window) → inference → (decisions) → serial
+        win_q: Queue = Queue(maxsize=1)
+        out_q: Queue = Queue(maxsize=8)
+        threads = [
+            threading.Thread(target=capture_loop, args=(board, win_q, stop), name="capture", daemon=True),
+            threading.Thread(target=inference_loop, args=(win_q, out_q, stop), name="inference", daemon=True),
+            threading.Thread(target=serial_loop, args=(ser, out_q, stop), name="serial", daemon=True),
+        ]
+        for t in threads:
+            t.start()
 
-            if window is None:
-                print("[TRACE] Not enough data yet for full window.")
-                time.sleep(0.2)
-                continue
-
-            try:
-                # 1) Features
-                feats = ei_spectral_features(window)
-
-                # Optional debug of raw signal + features
-                if window_idx < DEBUG_MAX_WINDOWS and (window_idx % DEBUG_FEATURES_EVERY_N == 0):
-                    debug_window_and_features(window, feats, window_idx)
-
-                # 2) Inference
-                x = feats.reshape(input_details[0]["shape"]).astype(np.float32)
-                interpreter.set_tensor(input_details[0]["index"], x)
-                interpreter.invoke()
-                y = interpreter.get_tensor(output_details[0]["index"])[0]
-
-                # Optional debug of raw model output
-                if window_idx < DEBUG_MAX_WINDOWS and (window_idx % DEBUG_RAW_OUTPUT_EVERY_N == 0):
-                    y_str = ", ".join(f"{v:.3f}" for v in y)
-                    print(f"[DEBUG] raw model output: [{y_str}]")
-
-                probs = {}
-                for i, label in enumerate(LABELS):
-                    if i < len(y):
-                        probs[label] = float(y[i])
-
-                if TARGET_CLASS_INDEX < len(y):
-                    p_target = float(y[TARGET_CLASS_INDEX])
-                else:
-                    p_target = float(max(y))
-
-            except Exception as e:
-                print(f"[WARN] Inference error, skipping this window: {e}")
-                time.sleep(DECISION_INTERVAL)
-                window_idx += 1
-                continue
-
-            # 3) Decision logic
-            is_target = p_target >= TARGET_THRESHOLD
-
-            decisions.append(is_target)
-            if len(decisions) > STABILITY_WINDOWS:
-                decisions = decisions[-STABILITY_WINDOWS:]
-
-            stable_target = all(decisions)
-
-            calm_p = probs.get("calm", 0.0)
-            non_calm_p = probs.get("non_calm", 0.0)
-            sleep_p = probs.get("sleep", 0.0)
-
-            print(
-                f"p_target={p_target:0.3f} "
-                f"(calm={calm_p:0.2f}, non_calm={non_calm_p:0.2f}, sleep={sleep_p:0.2f}) | "
-                f"last {len(decisions)}: {''.join('T' if d else 'N' for d in decisions)} | "
-                f"stable_target={stable_target}"
-            )
-
-            send_decision(ser, stable_target)
-
-            window_idx += 1
-            time.sleep(DECISION_INTERVAL)
+        while not stop.is_set():
+            stop.wait(0.5)
 
     except BrainFlowError as e:
         print(f"[ERROR] BrainFlow error: {e}")
     except KeyboardInterrupt:
         print("\n[INFO] Stopping (Ctrl+C)...")
     finally:
+        stop.set()
+        for t in threads:
+            t.join(timeout=2.0)
         if ser is not None:
             try:
                 ser.close()
@@ -54,6 +54,7 @@ MODEL_TFLITE = "EEG_float32.lite"
 MODEL_H5 = "EEG_model.h5"
 
 if os.path.exists(MODEL_H5):
+    import tensorflow as tf
     from tensorflow.keras.models import load_model
     model = load_model(MODEL_H5)
     INPUT_SHAPE = (1, model.input_shape[-1])
@@ -61,9 +62,17 @@ if os.path.exists(MODEL_H5):
     BACKEND = "keras"
     print(f"[INFO] Using Keras backend, model: {MODEL_H5}")
 
+    # Persistent input variable + XLA-compiled forward pass: skips predict()'s
+    # per-call tf.data/callback overhead, and the fixed shape traces only once
+    _x_var = tf.Variable(tf.zeros(INPUT_SHAPE, dtype=tf.float32), trainable=False)
+
+    @tf.function(jit_compile=True)
+    def _infer_fn(x):
+        return model(x, training=False)
+
     def infer(features: np.ndarray):
-        x = features.reshape(1, -1).astype(np.float32)
-        return model.predict(x, verbose=0)[0]
+        _x_var.assign(features.reshape(INPUT_SHAPE).astype(np.float32, copy=False))
+        return _infer_fn(_x_var).numpy()[0]
 
 elif os.path.exists(MODEL_TFLITE):
     try:
@@ -217,7 +226,8 @@ def ei_features_from_window(window: np.ndarray) -> np.ndarray:
 
     # --- Exact EI parity: EI uses log10 scaling internally ---
     if DO_LOG:
-        feats = np.log10(np.maximum(feats, 1e-9))
+        np.maximum(feats, 1e-9, out=feats)
+        np.log10(feats, out=feats)
 
     if feats.size != EXPECTED_FEATURES:
         if not _feature_mismatch_warned:
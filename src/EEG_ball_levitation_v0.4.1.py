@@ -5,7 +5,15 @@ import sys
 import time
 import re
 import argparse
+import functools
+import logging
+import threading
+from collections import deque
+from queue import Empty, Full, Queue
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import scipy.fft
+from scipy.fft import rfft, rfftfreq
 import serial
 from serial import SerialException
 from brainflow.board_shim import (
@@ -48,54 +56,116 @@ if pb_root not in sys.path:
 
 from spectral_analysis import generate_features
 
+# Numba is optional: only needed for the fast EI-compatible feature path below
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
 
-# ----------------- Model selection and setup -----------------
-MODEL_TFLITE = "EEG_float32.lite"
-MODEL_H5 = "EEG_model_64.h5"
-
-if os.path.exists(MODEL_H5):
-    from tensorflow.keras.models import load_model
+# pyFFTW is optional: when installed it becomes the scipy.fft backend (cached plans)
+try:
+    import pyfftw
+    import pyfftw.interfaces.scipy_fft
 
-    model = load_model(MODEL_H5)
-    INPUT_SHAPE = (1, model.input_shape[-1])
-    EXPECTED_FEATURES = model.input_shape[-1]
-    BACKEND = "keras"
-    print(f"[INFO] Using Keras backend, model: {MODEL_H5}")
+    pyfftw.interfaces.cache.enable()
+    scipy.fft.set_global_backend(pyfftw.interfaces.scipy_fft)
+except ImportError:
+    pass
 
-    def infer(features: np.ndarray):
-        # features already in EI log-spectral (and optionally scaled) space
-        x = features.reshape(1, -1).astype(np.float32)
-        return model.predict(x, verbose=0)[0]
 
-elif os.path.exists(MODEL_TFLITE):
+# ----------------- Model selection and setup -----------------
+MODEL_TFLITE = "EEG_float32.lite"
+MODEL_H5 = "EEG_model_64.h5"
+MODEL_H5_LITE = os.path.splitext(MODEL_H5)[0] + ".lite"   # cached conversion of MODEL_H5
+# Full-int8 build of MODEL_H5, preferred when present. Build it with:
+#   python convert_model.py --h5 EEG_model_64.h5 --out EEG_model_64_int8.lite \
+#       --quant int8 --calib training.npy
+# Either --io-type works: infer() (de)quantizes int8 I/O with the tensor params.
+MODEL_INT8 = os.path.splitext(MODEL_H5)[0] + "_int8.lite"
+
+# An int8 build older than MODEL_H5 predates a retrain: skip it for the fresh conversion
+USE_INT8 = os.path.exists(MODEL_INT8)
+if USE_INT8 and os.path.exists(MODEL_H5) and os.path.getmtime(MODEL_INT8) < os.path.getmtime(MODEL_H5):
+    print(f"[WARN] {MODEL_INT8} is older than {MODEL_H5}; ignoring it. Rebuild it with convert_model.py.")
+    USE_INT8 = False
+
+# Keras is only used to (re)build the cached TFLite model; inference always runs on TFLite
+if not USE_INT8 and os.path.exists(MODEL_H5) and (
+    not os.path.exists(MODEL_H5_LITE)
+    or os.path.getmtime(MODEL_H5_LITE) < os.path.getmtime(MODEL_H5)
+):
     try:
-        from tflite_runtime.interpreter import Interpreter
-        backend = "tflite-runtime"
-    except ImportError:
-        import tensorflow as tf
-        Interpreter = tf.lite.Interpreter
-        backend = "tensorflow.lite"
-
-    interpreter = Interpreter(model_path=MODEL_TFLITE)
-    interpreter.allocate_tensors()
-    input_details = interpreter.get_input_details()
-    output_details = interpreter.get_output_details()
-    INPUT_SHAPE = input_details[0]["shape"]
-    EXPECTED_FEATURES = int(np.prod(INPUT_SHAPE[1:]))
-    BACKEND = backend
-    print(f"[INFO] Using TFLite backend ({backend}), model: {MODEL_TFLITE}")
-
-    def infer(features: np.ndarray):
-        # features already in EI log-spectral (and optionally scaled) space
-        x = features.reshape(INPUT_SHAPE).astype(np.float32)
-        interpreter.set_tensor(input_details[0]["index"], x)
-        interpreter.invoke()
-        return interpreter.get_tensor(output_details[0]["index"])[0]
+        from convert_model import convert  # needs full TensorFlow
+
+        print(f"[INFO] Converting {MODEL_H5} -> {MODEL_H5_LITE} ...")
+        tflite_bytes = convert(MODEL_H5, "dynamic", None, 0)
+        with open(MODEL_H5_LITE, "wb") as f:
+            f.write(tflite_bytes)
+    except ImportError as e:
+        print(f"[WARN] Cannot convert {MODEL_H5} without TensorFlow ({e}).")
+
+if USE_INT8:
+    MODEL_PATH = MODEL_INT8
+elif os.path.exists(MODEL_H5_LITE):
+    MODEL_PATH = MODEL_H5_LITE
+elif os.path.exists(MODEL_TFLITE):
+    MODEL_PATH = MODEL_TFLITE
 else:
     raise FileNotFoundError(
-        f"No model file found. Expected one of:\n  {MODEL_H5}\n  {MODEL_TFLITE}"
+        f"No model file found. Expected one of:\n  {MODEL_INT8}\n  {MODEL_H5}\n  {MODEL_TFLITE}"
     )
 
+try:
+    from tflite_runtime.interpreter import Interpreter
+    backend = "tflite-runtime"
+except ImportError:
+    import tensorflow as tf
+    Interpreter = tf.lite.Interpreter
+    backend = "tensorflow.lite"
+
+# XNNPACK is the default CPU delegate in recent TFLite builds; give it every core
+interpreter = Interpreter(model_path=MODEL_PATH, num_threads=os.cpu_count() or 1)
+interpreter.allocate_tensors()
+input_details = interpreter.get_input_details()
+output_details = interpreter.get_output_details()
+INPUT_SHAPE = input_details[0]["shape"]
+EXPECTED_FEATURES = int(np.prod(INPUT_SHAPE[1:]))
+_IN_IDX = input_details[0]["index"]
+_OUT_IDX = output_details[0]["index"]
+# Callables returning live views of the interpreter's tensors. Keep the callables,
+# not the arrays: invoke() refuses to run while a view is still referenced.
+_in_tensor = interpreter.tensor(_IN_IDX)
+_out_tensor = interpreter.tensor(_OUT_IDX)
+# Integer I/O (convert_model.py's default --io-type int8): features/probabilities
+# are (de)quantized with the tensor params
+INPUT_QUANTIZED = input_details[0]["dtype"] != np.float32
+OUTPUT_QUANTIZED = output_details[0]["dtype"] != np.float32
+IN_SCALE, IN_ZERO = input_details[0]["quantization"]
+OUT_SCALE, OUT_ZERO = output_details[0]["quantization"]
+if INPUT_QUANTIZED:
+    _IN_INFO = np.iinfo(input_details[0]["dtype"])
+BACKEND = backend
+print(
+    f"[INFO] Using TFLite backend ({backend}), model: {MODEL_PATH}, "
+    f"input dtype: {input_details[0]['dtype'].__name__}"
+)
+
+
+def infer(features: np.ndarray):
+    # features already in EI log-spectral (and optionally scaled) space;
+    # copied straight into the input tensor instead of via set_tensor()
+    if INPUT_QUANTIZED:
+        q = np.rint(features.reshape(-1) / IN_SCALE + IN_ZERO)
+        np.clip(q, _IN_INFO.min, _IN_INFO.max, out=q)
+        np.copyto(_in_tensor().reshape(-1), q, casting="unsafe")
+    else:
+        np.copyto(_in_tensor().reshape(-1), features.reshape(-1))
+    interpreter.invoke()
+    if OUTPUT_QUANTIZED:
+        return (_out_tensor()[0].astype(np.float32) - OUT_ZERO) * OUT_SCALE
+    return _out_tensor()[0].copy()
+
 
 # ================== CONFIG ==================
 
@@ -129,6 +199,12 @@ WAVELET_LEVEL = 1
 WAVELET = ""
 EXTRA_LOW_FREQ = False
 
+# Re-implementation of the EI spectral block (numba, or scipy.fft without it).
+# Off until --test-raw reports parity with generate_features for your project settings.
+USE_FAST_EI_FEATURES = False
+FAST_EI_PARITY_ATOL = 1e-5
+FFT_OVERLAP_FRACTION = 0.25     # frame overlap used by the EI block when DO_FFT_OVERLAP
+
 LABELS = ["calm", "non_calm", "sleep"]
 TARGET_CLASS_INDEX = 1
 
@@ -138,22 +214,267 @@ SERIAL_BAUD = 115200
 
 DEBUG_MAX_WINDOWS = 40
 DEBUG_EVERY_N = 10
+LOG_LEVEL = logging.INFO        # DEBUG also shows per-window decisions when running without serial
+LOG_EVERY_N = 1                 # print the p_target/decision line every N windows
 _feature_mismatch_warned = False
+logger = logging.getLogger("eeg")
+_last_sent = None   # decision of the last line started on the serial port
+_serial_tail = b""  # unsent rest of a partially written line, finished before anything else
+
+# generate_features with every config argument bound once; only raw_data varies per call
+_gen_features = functools.partial(
+    generate_features,
+    implementation_version=IMPLEMENTATION_VERSION,
+    draw_graphs=DRAW_GRAPHS,
+    axes=AXES,
+    sampling_freq=FS,
+    scale_axes=SCALE_AXES,
+    input_decimation_ratio=INPUT_DECIMATION_RATIO,
+    filter_type=FILTER_TYPE,
+    filter_cutoff=FILTER_CUTOFF,
+    filter_order=FILTER_ORDER,
+    analysis_type=ANALYSIS_TYPE,
+    fft_length=FFT_LENGTH,
+    spectral_peaks_count=SPECTRAL_PEAKS_COUNT,
+    spectral_peaks_threshold=SPECTRAL_PEAKS_THRESHOLD,
+    spectral_power_edges=SPECTRAL_POWER_EDGES,
+    do_log=DO_LOG_IN_BLOCK,
+    do_fft_overlap=DO_FFT_OVERLAP,
+    wavelet_level=WAVELET_LEVEL,
+    wavelet=WAVELET,
+    extra_low_freq=EXTRA_LOW_FREQ,
+)
+
+
+
+# out["features"] -> float32 array. The EI block's output type is fixed, so it is
+# probed once and _to_feats is rebound to the matching converter.
+def _feats_from_list(values) -> np.ndarray:
+    return np.fromiter(values, dtype=np.float32, count=len(values))
+
+
+def _feats_from_array(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float32)   # no copy if already float32
+
+
+def _to_feats_probe(values) -> np.ndarray:
+    global _to_feats
+    _to_feats = _feats_from_list if isinstance(values, list) else _feats_from_array
+    return _to_feats(values)
+
+
+_to_feats = _to_feats_probe
+
+
+# ================== FAST EI FEATURES ==================
+#
+# Per axis, mirroring the EI spectral block (FFT analysis, no filter):
+#   RMS, skewness, kurtosis of the demeaned signal,
+#   skewness and kurtosis of the spectrum,
+#   max-hold power spectrum |X|^2 / FFT_LENGTH over (overlapping) frames,
+#   DC bin dropped unless EXTRA_LOW_FREQ, optionally log10'd.
+# With numba the FFT_LENGTH-point real DFT is a precomputed cos/sin table, so the
+# whole feature vector is produced by one compiled kernel; without it the frames
+# go through scipy.fft.rfft for all axes at once.
+
+_DFT_K = np.arange(FFT_LENGTH // 2 + 1)[:, None] * np.arange(FFT_LENGTH)[None, :]
+_DFT_COS = np.cos(2.0 * np.pi * _DFT_K / FFT_LENGTH).astype(np.float32)
+_DFT_SIN = np.sin(2.0 * np.pi * _DFT_K / FFT_LENGTH).astype(np.float32)
+_FFT_HOP = FFT_LENGTH - (int(FFT_LENGTH * FFT_OVERLAP_FRACTION) if DO_FFT_OVERLAP else 0)
+_FIRST_BIN = 0 if EXTRA_LOW_FREQ else 1
+_FEATS_PER_AXIS = 5 + (FFT_LENGTH // 2 + 1 - _FIRST_BIN)
+_STAT_NAMES = ("rms", "skew", "kurtosis", "spec_skew", "spec_kurtosis")
+_FREQS = rfftfreq(FFT_LENGTH, d=1.0 / FS)[_FIRST_BIN:]   # Hz of each spectral feature bin
+
+
+def _frame_geometry(n: int):
+    """Number of max-hold frames and zero-padded length for an n-sample axis."""
+    n_frames = -(-n // _FFT_HOP)
+    return n_frames, (n_frames - 1) * _FFT_HOP + FFT_LENGTH
+
+
+# Frame layout and zero-padded scratch for the live window length, computed once
+_WINDOW_SAMPLES = int(WINDOW_SECONDS * FS)
+_N_FRAMES, _PAD_LEN = _frame_geometry(_WINDOW_SAMPLES)
+_PAD_BUF = np.zeros((len(AXES), _PAD_LEN))
+
+if NUMBA_AVAILABLE:
+
+    @njit(cache=True, fastmath=True)
+    def _moments(v, n):
+        """Biased skewness and (Fisher) kurtosis of v[:n], like scipy.stats defaults."""
+        mean = 0.0
+        for i in range(n):
+            mean += v[i]
+        mean /= n
+        m2 = 0.0
+        m3 = 0.0
+        m4 = 0.0
+        for i in range(n):
+            d = v[i] - mean
+            d2 = d * d
+            m2 += d2
+            m3 += d2 * d
+            m4 += d2 * d2
+        m2 /= n
+        m3 /= n
+        m4 /= n
+        if m2 <= 0.0:
+            return 0.0, -3.0
+        return m3 / m2 ** 1.5, m4 / (m2 * m2) - 3.0
+
+    @njit(cache=True, fastmath=True)
+    def _ei_features_numba(x, scale, cos_t, sin_t, hop, first_bin, do_log, out):
+        """x: (axes, N) float32 window; out: flat float32 feature vector (axis-major)."""
+        n_ax, n = x.shape
+        n_bins, nfft = cos_t.shape
+        fx = np.empty(n, dtype=np.float64)
+        powers = np.empty(n_bins, dtype=np.float64)
+        per_axis = 5 + n_bins - first_bin
+        for a in range(n_ax):
+            mean = 0.0
+            for i in range(n):
+                mean += x[a, i]
+            mean /= n
+            ss = 0.0
+            for i in range(n):
+                v = (x[a, i] - mean) * scale
+                fx[i] = v
+                ss += v * v
+            skew, kurt = _moments(fx, n)
+
+            # Max-hold power spectrum over frames; the tail frame is zero-padded
+            for k in range(n_bins):
+                powers[k] = 0.0
+            ix = 0
+            while ix < n:
+                m = min(nfft, n - ix)
+                for k in range(n_bins):
+                    re = 0.0
+                    im = 0.0
+                    for i in range(m):
+                        s = fx[ix + i]
+                        re += s * cos_t[k, i]
+                        im -= s * sin_t[k, i]
+                    p = (re * re + im * im) / nfft
+                    if p > powers[k]:
+                        powers[k] = p
+                ix += hop
+
+            o = a * per_axis
+            out[o] = np.sqrt(ss / n)
+            out[o + 1] = skew
+            out[o + 2] = kurt
+            sp_skew, sp_kurt = _moments(powers[first_bin:], n_bins - first_bin)
+            out[o + 3] = sp_skew
+            out[o + 4] = sp_kurt
+            for k in range(first_bin, n_bins):
+                p = powers[k]
+                if do_log:
+                    p = np.log10(max(p, 1e-9))
+                out[o + 5 + k - first_bin] = p
+
+
+def _moments_np(v: np.ndarray):
+    """Row-wise biased skewness and (Fisher) kurtosis, like scipy.stats defaults."""
+    d = v - v.mean(axis=1, keepdims=True)
+    d2 = d * d
+    m2 = d2.mean(axis=1)
+    m3 = (d2 * d).mean(axis=1)
+    m4 = (d2 * d2).mean(axis=1)
+    safe = np.where(m2 > 0.0, m2, 1.0)
+    skew = np.where(m2 > 0.0, m3 / safe ** 1.5, 0.0)
+    kurt = np.where(m2 > 0.0, m4 / (safe * safe) - 3.0, -3.0)
+    return skew, kurt
+
+
+def _ei_features_scipy(x: np.ndarray, out: np.ndarray):
+    """Same features as _ei_features_numba, with the frame FFTs done by scipy.fft."""
+    n_ax, n = x.shape
+    fx = x.astype(np.float64)
+    fx -= fx.mean(axis=1, keepdims=True)
+    fx *= SCALE_AXES
+    feats = out.reshape(n_ax, _FEATS_PER_AXIS)
+
+    feats[:, 0] = np.sqrt(np.mean(fx * fx, axis=1))
+    feats[:, 1], feats[:, 2] = _moments_np(fx)
+
+    # Max-hold power spectrum: all (axis, frame) pairs in one batched rfft. The
+    # signal is zero-padded so the tail frames match the EI block's padding.
+    if (n_ax, n) == (len(AXES), _WINDOW_SAMPLES):
+        padded = _PAD_BUF   # tail beyond n is never written, so it stays zero
+    else:
+        padded = np.zeros((n_ax, _frame_geometry(n)[1]))
+    padded[:, :n] = fx
+    frames = sliding_window_view(padded, FFT_LENGTH, axis=-1)[:, ::_FFT_HOP, :]
+    spec = rfft(frames, axis=-1, workers=-1)            # (axes, frames, bins)
+    power = spec.real * spec.real
+    power += spec.imag * spec.imag
+    powers = power.max(axis=1)[:, _FIRST_BIN:] / FFT_LENGTH
+
+    feats[:, 3], feats[:, 4] = _moments_np(powers)
+    if DO_LOG_IN_BLOCK:
+        np.log10(np.maximum(powers, 1e-9), out=powers)
+    feats[:, 5:] = powers
+
+
+def ei_features_fast(window: np.ndarray) -> np.ndarray:
+    """EI-compatible features from a (axes, N) window, without generate_features."""
+    x = np.ascontiguousarray(window, dtype=np.float32)
+    out = np.empty(x.shape[0] * _FEATS_PER_AXIS, dtype=np.float32)
+    if NUMBA_AVAILABLE:
+        _ei_features_numba(
+            x, SCALE_AXES, _DFT_COS, _DFT_SIN, _FFT_HOP, _FIRST_BIN, DO_LOG_IN_BLOCK, out
+        )
+    else:
+        _ei_features_scipy(x, out)
+    return out
+
+
+def check_fast_feature_parity(window: np.ndarray, reference: np.ndarray) -> bool:
+    """Compare the fast path against generate_features output for the same window."""
+    fast = ei_features_fast(window)
+    if fast.size != reference.size:
+        print(f"[PARITY] Length differs: fast={fast.size}, EI={reference.size}")
+        return False
+    err = np.abs(fast - reference)
+    worst = int(np.argmax(err))
+    ok = bool(err[worst] <= FAST_EI_PARITY_ATOL)
+    axis, j = divmod(worst, _FEATS_PER_AXIS)
+    name = _STAT_NAMES[j] if j < len(_STAT_NAMES) else f"{_FREQS[j - len(_STAT_NAMES)]:.1f} Hz"
+    where = f"{AXES[axis]}/{name}"
+    print(
+        f"[PARITY] max |fast - EI| = {err[worst]:.3g} at feature {worst} ({where}) "
+        f"({'OK' if ok else 'MISMATCH'}, atol={FAST_EI_PARITY_ATOL:g})"
+    )
+    return ok
+
+# Board constants, filled once by init_board() instead of queried every window
+_FS_CACHED = None
+_EEG_CHANNELS_CACHED = None
+_NEEDED = None
+_win_buf = None     # reused (channels, _NEEDED) float32 window returned by get_eeg_window
+_raw_buf = None     # reused (_NEEDED, channels) float32 interleaved input for the EI block
 
 
 # ================== HELPERS ==================
 
 
 def init_board() -> BoardShim:
+    global _FS_CACHED, _EEG_CHANNELS_CACHED, _NEEDED, _win_buf, _raw_buf
+
     BoardShim.enable_dev_board_logger()
     params = BrainFlowInputParams()
     print("[INFO] Preparing Muse / BrainFlow session...")
     board = BoardShim(BOARD_ID, params)
     board.prepare_session()
     board.start_stream(45000)
-    eeg_channels = BoardShim.get_eeg_channels(BOARD_ID)
-    fs = BoardShim.get_sampling_rate(BOARD_ID)
-    print(f"[INFO] EEG channels: {eeg_channels}, sampling rate: {fs} Hz")
+    _FS_CACHED = BoardShim.get_sampling_rate(BOARD_ID)
+    _EEG_CHANNELS_CACHED = np.asarray(BoardShim.get_eeg_channels(BOARD_ID), dtype=np.intp)
+    _NEEDED = int(WINDOW_SECONDS * _FS_CACHED)
+    _win_buf = np.empty((len(_EEG_CHANNELS_CACHED), _NEEDED), dtype=np.float32)
+    _raw_buf = np.empty((_NEEDED, len(AXES)), dtype=np.float32)
+    print(f"[INFO] EEG channels: {_EEG_CHANNELS_CACHED.tolist()}, sampling rate: {_FS_CACHED} Hz")
     time.sleep(1.0)
     return board
 
@@ -163,7 +484,8 @@ def init_serial():
         print("[INFO] SERIAL_ENABLED = False, running without Photon 2.")
         return None
     try:
-        ser = serial.Serial(SERIAL_PORT, SERIAL_BAUD, timeout=1)
+        # write_timeout=0: writes never block the EEG loop (see send_decision)
+        ser = serial.Serial(SERIAL_PORT, SERIAL_BAUD, timeout=1, write_timeout=0)
         print(f"[INFO] Serial connected on {SERIAL_PORT} @ {SERIAL_BAUD}.")
         return ser
     except SerialException as e:
@@ -172,15 +494,18 @@ def init_serial():
         return None
 
 
-def get_eeg_window(board: BoardShim, window_sec: float) -> np.ndarray | None:
-    fs = BoardShim.get_sampling_rate(BOARD_ID)
-    needed = int(window_sec * fs)
-    data = board.get_current_board_data(needed)
-    if data.shape[1] < needed:
+def get_eeg_window(board: BoardShim) -> np.ndarray | None:
+    """
+    Latest WINDOW_SECONDS of EEG as a contiguous float32 (channels, samples) array.
+    The returned array is a shared buffer, overwritten by the next call.
+    """
+    data = board.get_current_board_data(_NEEDED)
+    if data.shape[1] < _NEEDED:
         return None
-    eeg_channels = BoardShim.get_eeg_channels(BOARD_ID)
-    window = data[eeg_channels, -needed:]
-    return window
+    # Gather the EEG rows straight into the persistent buffer, casting the
+    # BrainFlow doubles to float32 once here for everything downstream
+    np.take(data[:, -_NEEDED:], _EEG_CHANNELS_CACHED, axis=0, out=_win_buf)
+    return _win_buf
 
 
 def ei_features_from_window(window: np.ndarray) -> np.ndarray:
@@ -191,33 +516,28 @@ def ei_features_from_window(window: np.ndarray) -> np.ndarray:
     if ch != len(AXES):
         raise ValueError(f"Expected {len(AXES)} channels, got {ch}")
 
-    # EI DSP expects interleaved samples per axis in row-major order
-    raw_data = window.T.astype(np.float32).flatten()
-
-    out = generate_features(
-        IMPLEMENTATION_VERSION,
-        DRAW_GRAPHS,
-        raw_data,
-        AXES,
-        FS,
-        SCALE_AXES,
-        INPUT_DECIMATION_RATIO,
-        FILTER_TYPE,
-        FILTER_CUTOFF,
-        FILTER_ORDER,
-        ANALYSIS_TYPE,
-        FFT_LENGTH,
-        SPECTRAL_PEAKS_COUNT,
-        SPECTRAL_PEAKS_THRESHOLD,
-        SPECTRAL_POWER_EDGES,
-        DO_LOG_IN_BLOCK,
-        DO_FFT_OVERLAP,
-        WAVELET_LEVEL,
-        WAVELET,
-        EXTRA_LOW_FREQ,
-    )
+    if USE_FAST_EI_FEATURES:
+        feats = ei_features_fast(window)
+        if feats.size == EXPECTED_FEATURES:
+            return feats
+        if not _feature_mismatch_warned:
+            print(
+                f"[ERROR] Fast feature length {feats.size} != expected {EXPECTED_FEATURES}; "
+                "falling back to generate_features."
+            )
+            _feature_mismatch_warned = True
+
+    # EI DSP expects interleaved samples per axis in row-major order:
+    # one fused transpose+cast pass into the reusable buffer, then a flat view
+    if _raw_buf is not None and _raw_buf.shape == (n, ch):
+        np.copyto(_raw_buf, window.T)
+        raw_data = _raw_buf.reshape(-1)
+    else:
+        raw_data = np.ascontiguousarray(window.T, dtype=np.float32).reshape(-1)
+
+    out = _gen_features(raw_data=raw_data)
 
-    feats = np.asarray(out["features"], dtype=np.float32)
+    feats = _to_feats(out["features"])
 
     if feats.size != EXPECTED_FEATURES:
         if not _feature_mismatch_warned:
@@ -249,30 +569,9 @@ def ei_features_from_raw_vector(raw: np.ndarray) -> np.ndarray:
             "Check that you're copying the correct raw feature row from EI."
         )
 
-    out = generate_features(
-        IMPLEMENTATION_VERSION,
-        DRAW_GRAPHS,
-        raw.astype(np.float32),
-        AXES,
-        FS,
-        SCALE_AXES,
-        INPUT_DECIMATION_RATIO,
-        FILTER_TYPE,
-        FILTER_CUTOFF,
-        FILTER_ORDER,
-        ANALYSIS_TYPE,
-        FFT_LENGTH,
-        SPECTRAL_PEAKS_COUNT,
-        SPECTRAL_PEAKS_THRESHOLD,
-        SPECTRAL_POWER_EDGES,
-        DO_LOG_IN_BLOCK,
-        DO_FFT_OVERLAP,
-        WAVELET_LEVEL,
-        WAVELET,
-        EXTRA_LOW_FREQ,
-    )
+    out = _gen_features(raw_data=raw.astype(np.float32, copy=False))
 
-    feats = np.asarray(out["features"], dtype=np.float32)
+    feats = _to_feats(out["features"])
 
     if feats.size != EXPECTED_FEATURES:
         if not _feature_mismatch_warned:
@@ -297,19 +596,46 @@ def run_inference(window: np.ndarray):
 
 
 def send_decision(ser, is_target: bool):
-    val = b"1\n" if is_target else b"0\n"
+    """
+    Send the decision only when it changes; a stalled port drops the write instead of blocking.
+
+    The port is non-blocking, so write() may accept only part of a line. The unsent
+    tail is kept and completed first on the next call (the Photon 2 parses whole
+    lines), and a line that did not start at all is simply retried.
+    """
+    global _last_sent, _serial_tail
+
     if ser is not None and ser.is_open:
+        val = b"" if is_target == _last_sent else (b"1\n" if is_target else b"0\n")
+        out = _serial_tail + val
+        if not out:
+            return
         try:
-            ser.write(val)
+            n = ser.write(out)
         except SerialException as e:
+            # _serial_tail stays: the interrupted line must still be finished
+            _last_sent = None
             print(f"[WARN] Serial write failed: {e}")
+            return
+        started = n - len(_serial_tail)  # bytes of the new line that went out
+        if started < 0:
+            _serial_tail = _serial_tail[n:]
+        elif val and started > 0:
+            _last_sent = is_target
+            _serial_tail = val[started:]
+        else:
+            _serial_tail = b""
     else:
-        print(f"[DEBUG] Decision => {'1 (TARGET)' if is_target else '0 (NON-TARGET)'}")
+        logger.debug("[DEBUG] Decision => %s", "1 (TARGET)" if is_target else "0 (NON-TARGET)")
 
 
 # ================== EI FEATURE TEST MODES ==================
 
 
+# Integers, decimals and scientific notation (EI exports e.g. "1.2e-05"), with +/-
+_NUM_RE = re.compile(r"[-+]?(?:\d*\.\d+|\d+)(?:[eE][-+]?\d+)?")
+
+
 def parse_ei_feature_string(text: str) -> np.ndarray:
     """
     Parse a line copied from Edge Impulse into a float32 vector.
@@ -317,12 +643,11 @@ def parse_ei_feature_string(text: str) -> np.ndarray:
     Accepts comma- or space-separated values and ignores other text on the line,
     so you can paste directly from EI tables.
     """
-    # Find all numbers (handles integers and floats, with +/-)
-    nums = re.findall(r"[-+]?(?:\d*\.\d+|\d+)", text)
+    nums = _NUM_RE.findall(text)
     if not nums:
         return np.array([], dtype=np.float32)
-    arr = np.array([float(x) for x in nums], dtype=np.float32)
-    return arr
+    # Every token is a well-formed number, so NumPy's C parser reads them all in one go
+    return np.fromstring(" ".join(nums), dtype=np.float32, sep=" ")
 
 
 def test_with_ei_features(feature_text: str):
@@ -396,6 +721,10 @@ def test_with_raw_samples(raw_text: str):
     print(f"[TEST-RAW] Generated {feats.size} spectral features from raw input.")
     print(f"[TEST-RAW] Model expects {EXPECTED_FEATURES} features.")
 
+    # Same raw samples through the fast path: gate for USE_FAST_EI_FEATURES
+    usable = (raw.size // len(AXES)) * len(AXES)
+    check_fast_feature_parity(raw[:usable].reshape(-1, len(AXES)).T, feats)
+
     if feats.size != EXPECTED_FEATURES:
         print(
             "[TEST-RAW][ERROR] Spectral feature length mismatch; DSP parameters likely "
@@ -426,13 +755,39 @@ def test_with_raw_samples(raw_text: str):
 # ================== MAIN LIVE LOOP ==================
 
 
+def acquisition_loop(board: BoardShim, win_q: Queue, stop: threading.Event):
+    """Producer thread: grab a window every STRIDE_SECONDS, keeping only the newest two."""
+    try:
+        while not stop.is_set():
+            window = get_eeg_window(board)
+            if window is None:
+                print("[TRACE] Not enough data yet for full window.")
+            else:
+                # get_eeg_window reuses one buffer, so hand the consumer its own copy
+                window = window.copy()
+                try:
+                    win_q.put_nowait(window)
+                except Full:
+                    try:
+                        win_q.get_nowait()  # drop the oldest, stale window
+                    except Empty:
+                        pass
+                    win_q.put_nowait(window)
+            time.sleep(STRIDE_SECONDS)
+    except BrainFlowError as e:
+        print(f"[ERROR] BrainFlow error: {e}")
+        stop.set()
+
+
 def live_loop():
-    """Original live Muse→EI→decision loop."""
+    """Live Muse→EI→decision loop; acquisition runs on its own thread."""
     board = None
     ser = None
-    decisions: list[bool] = []
-    prob_buffer: list[float] = []
+    decisions: deque[bool] = deque(maxlen=STABILITY_WINDOWS)
+    prob_buffer: deque[float] = deque(maxlen=SMOOTH_WINDOWS)
     window_idx = 0
+    stop = threading.Event()
+    producer = None
 
     try:
         board = init_board()
@@ -440,12 +795,16 @@ def live_loop():
         print("[INFO] Entering main EEG → decision loop.")
         print(f"[DEBUG] Backend: {BACKEND}, Input shape: {INPUT_SHAPE}")
 
-        while True:
-            window = get_eeg_window(board, WINDOW_SECONDS)
-            if window is None:
-                print("[TRACE] Not enough data yet for full window.")
-                time.sleep(STRIDE_SECONDS)
-                window_idx += 1
+        win_q: Queue = Queue(maxsize=2)
+        producer = threading.Thread(
+            target=acquisition_loop, args=(board, win_q, stop), name="acquisition", daemon=True
+        )
+        producer.start()
+
+        while not stop.is_set():
+            try:
+                window = win_q.get(timeout=0.5)
+            except Empty:
                 continue
 
             if window_idx < DEBUG_MAX_WINDOWS and (window_idx % DEBUG_EVERY_N == 0):
@@ -460,47 +819,48 @@ def live_loop():
 
             result = run_inference(window)
             if result is None:
-                time.sleep(STRIDE_SECONDS)
                 window_idx += 1
                 continue
 
             p_target, probs = result
             prob_buffer.append(p_target)
-            if len(prob_buffer) > SMOOTH_WINDOWS:
-                prob_buffer = prob_buffer[-SMOOTH_WINDOWS:]
+            probs_arr = np.fromiter(prob_buffer, dtype=np.float64, count=len(prob_buffer))
 
             # --- Smoothing ---
             if USE_MEDIAN_SMOOTH:
-                p_smoothed = float(np.median(prob_buffer))
+                p_smoothed = float(np.median(probs_arr))
             else:
-                p_smoothed = float(np.mean(prob_buffer))
+                p_smoothed = float(probs_arr.mean())
 
             is_target = p_smoothed >= TARGET_THRESHOLD
             decisions.append(is_target)
-            if len(decisions) > STABILITY_WINDOWS:
-                decisions = decisions[-STABILITY_WINDOWS:]
             stable_target = all(decisions)
 
-            calm_p = probs.get("calm", 0.0)
-            non_calm_p = probs.get("non_calm", 0.0)
-            sleep_p = probs.get("sleep", 0.0)
-
-            print(
-                f"p_target={p_smoothed:.3f} "
-                f"(calm={calm_p:.2f}, non_calm={non_calm_p:.2f}, sleep={sleep_p:.2f}) | "
-                f"last {len(decisions)}: {''.join('T' if d else 'N' for d in decisions)} | "
-                f"stable_target={stable_target}"
-            )
+            # Formatting only happens when the line will actually be shown
+            if window_idx % LOG_EVERY_N == 0 and logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "p_target=%.3f (calm=%.2f, non_calm=%.2f, sleep=%.2f) | "
+                    "last %d: %s | stable_target=%s",
+                    p_smoothed,
+                    probs.get("calm", 0.0),
+                    probs.get("non_calm", 0.0),
+                    probs.get("sleep", 0.0),
+                    len(decisions),
+                    "".join("T" if d else "N" for d in decisions),
+                    stable_target,
+                )
 
             send_decision(ser, stable_target)
             window_idx += 1
-            time.sleep(STRIDE_SECONDS)
 
     except BrainFlowError as e:
         print(f"[ERROR] BrainFlow error: {e}")
     except KeyboardInterrupt:
         print("\n[INFO] Stopping (Ctrl+C)...")
     finally:
+        stop.set()
+        if producer is not None:
+            producer.join(timeout=2.0)
         if ser:
             try:
                 ser.close()
@@ -544,6 +904,8 @@ def main():
     )
     args = parser.parse_args()
 
+    logging.basicConfig(level=LOG_LEVEL, format="%(message)s")
+
     if args.test_raw:
         test_with_raw_samples(args.test_raw)
     elif args.test_features:
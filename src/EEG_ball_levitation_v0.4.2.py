@@ -367,6 +367,10 @@ def map_class_to_blower_speed(pred_class: int) -> int:
 # ================== EI FEATURE TEST MODES ==================
 
 
+# Integers, decimals and scientific notation (EI exports e.g. "1.2e-05"), with +/-
+_NUM_RE = re.compile(r"[-+]?(?:\d*\.\d+|\d+)(?:[eE][-+]?\d+)?")
+
+
 def parse_ei_feature_string(text: str) -> np.ndarray:
     """
     Parse a line copied from Edge Impulse into a float32 vector.
@@ -374,12 +378,11 @@ def parse_ei_feature_string(text: str) -> np.ndarray:
     Accepts comma- or space-separated values and ignores other text on the line,
     so you can paste directly from EI tables.
     """
-    # Find all numbers (handles integers and floats, with +/-)
-    nums = re.findall(r"[-+]?(?:\d*\.\d+|\d+)", text)
+    nums = _NUM_RE.findall(text)
     if not nums:
         return np.array([], dtype=np.float32)
-    arr = np.array([float(x) for x in nums], dtype=np.float32)
-    return arr
+    # Every token is a well-formed number, so NumPy's C parser reads them all in one go
+    return np.fromstring(" ".join(nums), dtype=np.float32, sep=" ")
 
 
 def test_with_ei_features(feature_text: str):
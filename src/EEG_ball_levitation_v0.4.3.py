@@ -5,7 +5,7 @@ import sys
 import time
 import re
 import argparse
-from collections import Counter
+import logging
 import socket
 import numpy as np
 import serial
@@ -50,56 +50,133 @@ if pb_root not in sys.path:
 
 from spectral_analysis import generate_features
 
+# Numba is optional: only used to interleave the window for the EI block
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 
 # ----------------- Model selection and setup -----------------
 MODEL_TFLITE = "EEG_float32_FFT8_1.lite" # "EEG_float32.lite"
+# Full-int8 build of the same model, preferred when present. Build it with:
+#   python convert_model.py --h5 <model>.h5 --out EEG_int8_FFT8_1.lite --quant int8 --calib <features>.npy
+MODEL_TFLITE_INT8 = "EEG_int8_FFT8_1.lite"
 MODEL_H5 = "EEG_model_64.h5"
+MODEL_H5_LITE = os.path.splitext(MODEL_H5)[0] + ".lite"   # cached conversion of MODEL_H5
+
+# Inference always runs on TFLite. Keras/TensorFlow is only loaded to convert the .h5
+# (once, cached next to it) when no ready-made .lite model is present.
+# load_model() is called from main(), so importing this file loads nothing heavy.
+
+
+def _is_older_than_h5(path: str) -> bool:
+    return os.path.exists(MODEL_H5) and os.path.getmtime(path) < os.path.getmtime(MODEL_H5)
+
+
+def _select_model_path() -> str:
+    if os.path.exists(MODEL_TFLITE_INT8):
+        if not _is_older_than_h5(MODEL_TFLITE_INT8):
+            return MODEL_TFLITE_INT8
+        # Built before the last retrain: don't let it shadow the newer model
+        print(f"[WARN] {MODEL_TFLITE_INT8} is older than {MODEL_H5}; ignoring it. "
+              "Rebuild it with convert_model.py.")
+    if os.path.exists(MODEL_TFLITE):
+        return MODEL_TFLITE
+    if os.path.exists(MODEL_H5):
+        if (
+            not os.path.exists(MODEL_H5_LITE)
+            or os.path.getmtime(MODEL_H5_LITE) < os.path.getmtime(MODEL_H5)
+        ):
+            from convert_model import convert  # needs full TensorFlow
+
+            print(f"[INFO] Converting {MODEL_H5} -> {MODEL_H5_LITE} ...")
+            tflite_bytes = convert(MODEL_H5, "none", None, 0)
+            with open(MODEL_H5_LITE, "wb") as f:
+                f.write(tflite_bytes)
+        return MODEL_H5_LITE
+    raise FileNotFoundError(
+        f"No model file found. Expected one of:\n  {MODEL_TFLITE_INT8}\n  {MODEL_TFLITE}\n  {MODEL_H5}"
+    )
+
+
+# XNNPACK is the default CPU delegate in current TFLite builds; it only needs threads.
+# Capped at 4: more threads regress on big.LITTLE SoCs for a model this small.
+TFLITE_NUM_THREADS = min(4, os.cpu_count() or 2)
 
-if os.path.exists(MODEL_H5):
-    from tensorflow.keras.models import load_model
 
-    model = load_model(MODEL_H5)
-    INPUT_SHAPE = (1, model.input_shape[-1])
-    EXPECTED_FEATURES = model.input_shape[-1]
-    BACKEND = "keras"
-    print(f"[INFO] Using Keras backend, model: {MODEL_H5}")
+def load_model():
+    """Pick the model file, create the TFLite interpreter and cache its tensor details."""
+    global MODEL_PATH, BACKEND, interpreter, input_details, output_details
+    global INPUT_SHAPE, EXPECTED_FEATURES, IN_IDX, OUT_IDX, _in_view, _out_view
+    global INPUT_QUANTIZED, OUTPUT_QUANTIZED, IN_SCALE, IN_ZERO, OUT_SCALE, OUT_ZERO, _IN_INFO
+    global _FEAT_BUF, _Y_BUF
 
-    def infer(features: np.ndarray):
-        # features already in EI log-spectral (and optionally scaled) space
-        x = features.reshape(1, -1).astype(np.float32)
-        return model.predict(x, verbose=0)[0]
+    MODEL_PATH = _select_model_path()
 
-elif os.path.exists(MODEL_TFLITE):
     try:
         from tflite_runtime.interpreter import Interpreter
-        backend = "tflite-runtime"
+        BACKEND = "tflite-runtime"
     except ImportError:
         import tensorflow as tf
 
         Interpreter = tf.lite.Interpreter
-        backend = "tensorflow.lite"
+        BACKEND = "tensorflow.lite"
 
-    interpreter = Interpreter(model_path=MODEL_TFLITE)
+    interpreter = Interpreter(model_path=MODEL_PATH, num_threads=TFLITE_NUM_THREADS)
     interpreter.allocate_tensors()
     input_details = interpreter.get_input_details()
     output_details = interpreter.get_output_details()
     INPUT_SHAPE = input_details[0]["shape"]
     EXPECTED_FEATURES = int(np.prod(INPUT_SHAPE[1:]))
-    BACKEND = backend
-    print(f"[INFO] Using TFLite backend ({backend}), model: {MODEL_TFLITE}")
-
-    def infer(features: np.ndarray):
-        # features already in EI log-spectral (and optionally scaled) space
-        x = features.reshape(INPUT_SHAPE).astype(np.float32)
-        interpreter.set_tensor(input_details[0]["index"], x)
-        interpreter.invoke()
-        return interpreter.get_tensor(output_details[0]["index"])[0]
-else:
-    raise FileNotFoundError(
-        f"No model file found. Expected one of:\n  {MODEL_H5}\n  {MODEL_TFLITE}"
+    IN_IDX = input_details[0]["index"]
+    OUT_IDX = output_details[0]["index"]
+    # Callables returning live views of the tensors. Only the callables are kept:
+    # invoke() refuses to run while such a view is still referenced.
+    _in_view = interpreter.tensor(IN_IDX)
+    _out_view = interpreter.tensor(OUT_IDX)
+
+    # Integer models: features/probabilities are (de)quantized with the tensor params
+    INPUT_QUANTIZED = input_details[0]["dtype"] != np.float32
+    OUTPUT_QUANTIZED = output_details[0]["dtype"] != np.float32
+    IN_SCALE, IN_ZERO = input_details[0]["quantization"]
+    OUT_SCALE, OUT_ZERO = output_details[0]["quantization"]
+    if INPUT_QUANTIZED:
+        _IN_INFO = np.iinfo(input_details[0]["dtype"])
+
+    # Live-loop feature/output buffers, reused every stride
+    _FEAT_BUF = np.empty(EXPECTED_FEATURES, dtype=np.float32)
+    _Y_BUF = np.empty(int(np.prod(output_details[0]["shape"][1:])), dtype=np.float32)
+
+    print(
+        f"[INFO] Using TFLite backend ({BACKEND}), model: {MODEL_PATH}, "
+        f"input dtype: {input_details[0]['dtype'].__name__}, threads: {TFLITE_NUM_THREADS}"
     )
 
 
+def infer(features: np.ndarray, out: np.ndarray | None = None):
+    # features already in EI log-spectral (and optionally scaled) space,
+    # written straight into the interpreter's input tensor (no set_tensor copy).
+    # With `out` the (dequantized) output is written there instead of a new array.
+    if INPUT_QUANTIZED:
+        q = np.rint(features / IN_SCALE + IN_ZERO)
+        np.clip(q, _IN_INFO.min, _IN_INFO.max, out=q)
+        _in_view()[...] = q.reshape(INPUT_SHAPE)
+    else:
+        _in_view()[...] = features.reshape(INPUT_SHAPE)
+    interpreter.invoke()
+    if out is None:
+        if OUTPUT_QUANTIZED:
+            return (_out_view()[0].astype(np.float32) - OUT_ZERO) * OUT_SCALE
+        return _out_view()[0].copy()
+    out[...] = _out_view()[0]
+    if OUTPUT_QUANTIZED:
+        out -= OUT_ZERO
+        out *= OUT_SCALE
+    return out
+
+
 # ================== CONFIG ==================
 
 BOARD_ID = BoardIds.MUSE_2_BOARD.value
@@ -136,6 +213,13 @@ DO_FFT_OVERLAP = True
 WAVELET_LEVEL = 1
 WAVELET = ""
 EXTRA_LOW_FREQ = False
+FFT_OVERLAP_FRACTION = 0.25  # frame overlap of the EI block when DO_FFT_OVERLAP
+
+# Live loop only: reuse the FFT frames a window shares with the previous stride and
+# transform just the new ones instead of running generate_features every stride.
+# Checked against generate_features on the first live window; off by default.
+USE_INCREMENTAL_FFT = False
+INCREMENTAL_PARITY_ATOL = 1e-4
 
 LABELS = ["calm", "non_calm", "sleep"]
 
@@ -155,12 +239,35 @@ DEFAULT_WIFI_PORT = 9000
 
 DEBUG_MAX_WINDOWS = 40
 DEBUG_EVERY_N = 10
+LOG_LEVEL = logging.INFO  # WARNING silences the per-stride status line
+LOG_EVERY_N = 4  # print the probs/history/blower status line every N strides
 _feature_mismatch_warned = False
+logger = logging.getLogger("eeg")
+
+# Filled by init_board()
+EEG_CHANNELS: list[int] = []
+SAMPLING_RATE = 0
+NEEDED_SAMPLES = 0
+
+# Python-side EEG ring, (channels, 2 * NEEDED_SAMPLES); allocated in init_board()
+_ring = np.empty((0, 0), dtype=np.float64)
+_ring_end = 0
+_ring_fill = 0
+_ring_total = 0   # samples appended since start: absolute stream index of _ring_end
+_RING_KEEP = 0    # samples the ring retains (window + frame alignment slack)
+_window_start = 0  # absolute stream index of the last window's first sample
+
+# Reusable interleaved float32 input for the EI block (one live window's worth)
+_raw_buf = np.empty(int(WINDOW_SECONDS * FS) * len(AXES), dtype=np.float32)
 
 
 # ================== OUTPUT LINK (SERIAL / WIFI) ==================
 
 
+# Every possible PWM command line, encoded once
+_PWM_BYTES = tuple(f"{i}\n".encode("ascii") for i in range(256))
+
+
 class BlowerLink:
     """
     Simple transport wrapper: either serial or WiFi TCP.
@@ -178,7 +285,9 @@ class BlowerLink:
         self.mode = "none"
         self.ser: serial.Serial | None = None
         self.sock: socket.socket | None = None
-        self.sock_file = None
+        self._pending = bytearray()  # WiFi bytes the socket has not accepted yet
+        self._pending_value: int | None = None  # value whose line ends _pending
+        self._last_value: int | None = None  # last value fully delivered to the link
 
         if wifi_host is not None:
             # WiFi mode (TCP client)
@@ -186,7 +295,8 @@ class BlowerLink:
                 if wifi_port is None:
                     wifi_port = DEFAULT_WIFI_PORT
                 self.sock = socket.create_connection((wifi_host, wifi_port), timeout=timeout)
-                self.sock_file = self.sock.makefile("wb")
+                # Non-blocking: a slow WiFi link must never stall the EEG loop
+                self.sock.setblocking(False)
                 self.mode = "wifi"
                 print(f"[INFO] Using WiFi TCP → {wifi_host}:{wifi_port}")
             except OSError as e:
@@ -203,31 +313,46 @@ class BlowerLink:
                 print("[WARN] Continuing without Photon 2 output.")
 
     def send_pwm(self, value: int):
-        """Send one PWM command (0–255) followed by newline."""
+        """
+        Send one PWM command (0–255) followed by newline.
+        Repeats of the last delivered value are skipped; the vote rarely changes.
+        A failed write forgets the last value, so the next call sends again.
+        """
         value = max(0, min(255, int(value)))
-        line = f"{value}\n".encode("ascii")
-
-        if self.mode == "wifi" and self.sock_file is not None:
+        if value == self._last_value and not self._pending:
+            return
+        line = _PWM_BYTES[value]
+
+        if self.mode == "wifi" and self.sock is not None:
+            if value != self._pending_value:
+                self._pending += line
+                self._pending_value = value
             try:
-                self.sock_file.write(line)
-                self.sock_file.flush()
+                sent = self.sock.send(self._pending)
+                del self._pending[:sent]
+                if not self._pending:
+                    self._last_value = self._pending_value
+                    self._pending_value = None
+            except BlockingIOError:
+                pass  # socket buffer full: keep the bytes for the next call
             except OSError as e:
                 print(f"[WARN] WiFi write failed: {e}")
+                self._pending.clear()
+                self._pending_value = None
+                self._last_value = None
         elif self.mode == "serial" and self.ser is not None and self.ser.is_open:
             try:
                 self.ser.write(line)
+                self._last_value = value
             except SerialException as e:
                 print(f"[WARN] Serial write failed: {e}")
+                self._last_value = None
         else:
+            self._last_value = value
             print(f"[DEBUG] Blower PWM => {value} (no active link)")
 
     def close(self):
         if self.mode == "wifi":
-            try:
-                if self.sock_file is not None:
-                    self.sock_file.close()
-            except Exception:
-                pass
             try:
                 if self.sock is not None:
                     self.sock.close()
@@ -275,42 +400,117 @@ def init_output_link(args) -> BlowerLink | None:
 
 
 def init_board() -> BoardShim:
+    global EEG_CHANNELS, SAMPLING_RATE, NEEDED_SAMPLES, USE_INCREMENTAL_FFT
+    global _ring, _ring_end, _ring_fill, _ring_total, _RING_KEEP
+
     BoardShim.enable_dev_board_logger()
     params = BrainFlowInputParams()
     print("[INFO] Preparing Muse / BrainFlow session...")
     board = BoardShim(BOARD_ID, params)
     board.prepare_session()
     board.start_stream(45000)
-    eeg_channels = BoardShim.get_eeg_channels(BOARD_ID)
-    fs = BoardShim.get_sampling_rate(BOARD_ID)
-    print(f"[INFO] EEG channels: {eeg_channels}, sampling rate: {fs} Hz")
+    # Board constants never change during a session: query BrainFlow once
+    EEG_CHANNELS = BoardShim.get_eeg_channels(BOARD_ID)
+    SAMPLING_RATE = BoardShim.get_sampling_rate(BOARD_ID)
+    NEEDED_SAMPLES = int(WINDOW_SECONDS * SAMPLING_RATE)
+    if USE_INCREMENTAL_FFT and not _INCREMENTAL_SUPPORTED:
+        print("[WARN] Incremental FFT needs FFT analysis without filter/decimation/DC bin; disabled.")
+        USE_INCREMENTAL_FFT = False
+    # Aligned windows may end up to one hop before the newest sample
+    _RING_KEEP = NEEDED_SAMPLES + (_FFT_HOP - 1 if USE_INCREMENTAL_FFT else 0)
+    # Twice the kept span so appends rarely need to compact (see _ring_append)
+    _ring = np.empty((len(EEG_CHANNELS), 2 * _RING_KEEP), dtype=np.float64)
+    _ring_end = 0
+    _ring_fill = 0
+    _ring_total = 0
+    if USE_INCREMENTAL_FFT:
+        _init_frame_cache(len(EEG_CHANNELS), NEEDED_SAMPLES)
+    print(f"[INFO] EEG channels: {EEG_CHANNELS}, sampling rate: {SAMPLING_RATE} Hz")
     time.sleep(1.0)
     return board
 
 
-def get_eeg_window(board: BoardShim, window_sec: float) -> np.ndarray | None:
-    fs = BoardShim.get_sampling_rate(BOARD_ID)
-    needed = int(window_sec * fs)
-    data = board.get_current_board_data(needed)
-    if data.shape[1] < needed:
+def _ring_append(new: np.ndarray):
+    """Append (channels, k) new samples, keeping at least the last _RING_KEEP."""
+    global _ring_end, _ring_fill, _ring_total
+
+    k = new.shape[1]
+    _ring_total += k
+    if k >= _RING_KEEP:
+        # Backlog (e.g. first call after start-up): only the newest window matters
+        _ring[:, :_RING_KEEP] = new[:, -_RING_KEEP:]
+        _ring_end = _ring_fill = _RING_KEEP
+        return
+    if _ring_end + k > _ring.shape[1]:
+        # Out of room: move the live samples back to the front (once every ~N/k strides)
+        keep = _ring_fill
+        _ring[:, :keep] = _ring[:, _ring_end - keep:_ring_end]
+        _ring_end = keep
+    _ring[:, _ring_end:_ring_end + k] = new
+    _ring_end += k
+    _ring_fill = min(_ring_fill + k, _RING_KEEP)
+
+
+def get_eeg_window(board: BoardShim) -> np.ndarray | None:
+    """
+    Drain the samples that arrived since the last call into the Python ring
+    and return the newest NEEDED_SAMPLES as a (channels, n) view into it.
+    The view is a column slice of the wider ring, so it is *not* C-contiguous
+    (use np.ascontiguousarray where that matters), and is only valid until the next call.
+
+    With USE_INCREMENTAL_FFT the window start is snapped back to a multiple of
+    the FFT hop, so consecutive windows share their frames exactly.
+    """
+    global _window_start
+
+    data = board.get_board_data()
+    if data.shape[1] > 0:
+        _ring_append(data[EEG_CHANNELS])
+    lag = (_ring_total - NEEDED_SAMPLES) % _FFT_HOP if USE_INCREMENTAL_FFT else 0
+    if _ring_fill < NEEDED_SAMPLES + lag:
         return None
-    eeg_channels = BoardShim.get_eeg_channels(BOARD_ID)
-    window = data[eeg_channels, -needed:]
-    return window
+    end = _ring_end - lag
+    _window_start = _ring_total - lag - NEEDED_SAMPLES
+    return _ring[:, end - NEEDED_SAMPLES:end]
+
 
+if NUMBA_AVAILABLE:
 
-def ei_features_from_window(window: np.ndarray) -> np.ndarray:
-    """Compute EI spectral features (including log power inside the block) from a Muse window."""
+    @njit(cache=True)
+    def _interleave(window, out):
+        """(channels, n) -> [ch0[0], ch1[0], ..., ch0[1], ...] in one loop, cast to out.dtype."""
+        ch, n = window.shape
+        for t in range(n):
+            for c in range(ch):
+                out[t * ch + c] = window[c, t]
+
+else:
+
+    def _interleave(window, out):
+        ch, n = window.shape
+        out[:n * ch].reshape(n, ch)[:] = window.T
+
+
+def ei_features_from_window(window: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Compute EI spectral features (including log power inside the block) from a Muse window.
+    With `out` (EXPECTED_FEATURES float32) the features are copied there and `out` is returned.
+    """
     global _feature_mismatch_warned
 
     ch, n = window.shape
     if ch != len(AXES):
         raise ValueError(f"Expected {len(AXES)} channels, got {ch}")
 
-    # EI DSP expects interleaved samples per axis in row-major order
-    raw_data = window.T.astype(np.float32).flatten()
+    # EI DSP expects interleaved samples per axis in row-major order:
+    # one cast+copy into the reusable buffer instead of transpose/astype/flatten
+    if n * ch <= _raw_buf.size:
+        _interleave(window, _raw_buf)
+        raw_data = _raw_buf[:n * ch]
+    else:
+        raw_data = np.ascontiguousarray(window.T, dtype=np.float32).ravel()
 
-    out = generate_features(
+    res = generate_features(
         IMPLEMENTATION_VERSION,
         DRAW_GRAPHS,
         raw_data,
@@ -333,17 +533,20 @@ def ei_features_from_window(window: np.ndarray) -> np.ndarray:
         EXTRA_LOW_FREQ,
     )
 
-    feats = np.asarray(out["features"], dtype=np.float32)
+    features = res["features"]
 
-    if feats.size != EXPECTED_FEATURES:
+    if len(features) != EXPECTED_FEATURES:
         if not _feature_mismatch_warned:
             print(
-                f"[ERROR] Feature length mismatch: got {feats.size}, expected {EXPECTED_FEATURES}."
+                f"[ERROR] Feature length mismatch: got {len(features)}, expected {EXPECTED_FEATURES}."
             )
             _feature_mismatch_warned = True
         return np.array([], dtype=np.float32)
 
-    return feats
+    if out is None:
+        return np.asarray(features, dtype=np.float32)
+    out[:] = features
+    return out
 
 
 def ei_features_from_raw_vector(raw: np.ndarray) -> np.ndarray:
@@ -402,20 +605,144 @@ def ei_features_from_raw_vector(raw: np.ndarray) -> np.ndarray:
     return feats
 
 
+# ================== INCREMENTAL FFT FEATURES ==================
+#
+# The EI spectral block for this project's settings (FFT analysis, no filter, no
+# decimation, DC bin dropped), per axis:
+#   RMS, skewness, kurtosis of the demeaned signal,
+#   skewness and kurtosis of the spectrum,
+#   max-hold power spectrum |X|^2 / FFT_LENGTH over overlapping frames, log10'd.
+# Removing the window mean only changes the DC bin of a *full* frame, so the other
+# bins of every full frame depend on its own samples alone. Those are cached by
+# absolute stream position and only frames new since the last stride are transformed.
+# The zero-padded tail frame does see the mean and is recomputed every window.
+
+_FFT_HOP = FFT_LENGTH - (int(FFT_LENGTH * FFT_OVERLAP_FRACTION) if DO_FFT_OVERLAP else 0)
+_FIRST_BIN = 0 if EXTRA_LOW_FREQ else 1
+_FEATS_PER_AXIS = 5 + (FFT_LENGTH // 2 + 1 - _FIRST_BIN)
+_FRAME_TAPS = np.arange(FFT_LENGTH)
+_INCREMENTAL_SUPPORTED = (
+    ANALYSIS_TYPE == "FFT"
+    and FILTER_TYPE == "none"
+    and INPUT_DECIMATION_RATIO == 1
+    and not EXTRA_LOW_FREQ
+)
+
+# Unscaled |X|^2 of full frames, (axes, slots, bins); frame id f lives in slot f % slots
+_frame_pow = np.empty((0, 0, 0))
+_frame_ids = np.empty(0, dtype=np.int64)
+_incremental_checked = False
+
+
+def _init_frame_cache(n_axes: int, n: int):
+    """Size the frame cache for n-sample windows: one window plus a stride of new frames."""
+    global _frame_pow, _frame_ids
+    n_full = (n - FFT_LENGTH) // _FFT_HOP + 1
+    _frame_pow = np.empty((n_axes, 2 * n_full, FFT_LENGTH // 2 + 1 - _FIRST_BIN))
+    _frame_ids = np.full(2 * n_full, -1, dtype=np.int64)
+
+
+def _moments_np(v: np.ndarray):
+    """Row-wise biased skewness and (Fisher) kurtosis, like scipy.stats defaults."""
+    d = v - v.mean(axis=1, keepdims=True)
+    d2 = d * d
+    m2 = d2.mean(axis=1)
+    m3 = (d2 * d).mean(axis=1)
+    m4 = (d2 * d2).mean(axis=1)
+    safe = np.where(m2 > 0.0, m2, 1.0)
+    skew = np.where(m2 > 0.0, m3 / safe ** 1.5, 0.0)
+    kurt = np.where(m2 > 0.0, m4 / (safe * safe) - 3.0, -3.0)
+    return skew, kurt
+
+
+def ei_features_incremental(
+    window: np.ndarray, start: int, out: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    EI-compatible features from a (axes, n) live window whose first sample is
+    stream index `start` (a multiple of the FFT hop, see get_eeg_window).
+    """
+    n_ax, n = window.shape
+    n_full = (n - FFT_LENGTH) // _FFT_HOP + 1
+    first = start // _FFT_HOP
+    ids = np.arange(first, first + n_full)
+    slots = ids % _frame_ids.size
+
+    stale = _frame_ids[slots] != ids
+    if stale.any():
+        new_ids = ids[stale]
+        new_slots = slots[stale]
+        taps = ((new_ids - first) * _FFT_HOP)[:, None] + _FRAME_TAPS
+        spec = np.fft.rfft(window[:, taps], axis=-1)[..., _FIRST_BIN:]   # (axes, new, bins)
+        _frame_pow[:, new_slots] = spec.real * spec.real + spec.imag * spec.imag
+        _frame_ids[new_slots] = new_ids
+
+    powers = _frame_pow[:, slots].max(axis=1)
+    powers *= SCALE_AXES * SCALE_AXES / FFT_LENGTH
+
+    fx = window - window.mean(axis=1, keepdims=True)
+    fx *= SCALE_AXES
+    tail = np.empty((n_ax, FFT_LENGTH))
+    for ix in range(n_full * _FFT_HOP, n, _FFT_HOP):
+        tail[:, :n - ix] = fx[:, ix:]
+        tail[:, n - ix:] = 0.0
+        spec = np.fft.rfft(tail, axis=-1)[:, _FIRST_BIN:]
+        np.maximum(powers, (spec.real * spec.real + spec.imag * spec.imag) / FFT_LENGTH, out=powers)
+
+    if out is None:
+        out = np.empty(n_ax * _FEATS_PER_AXIS, dtype=np.float32)
+    feats = out.reshape(n_ax, _FEATS_PER_AXIS)
+    feats[:, 0] = np.sqrt(np.mean(fx * fx, axis=1))
+    feats[:, 1], feats[:, 2] = _moments_np(fx)
+    feats[:, 3], feats[:, 4] = _moments_np(powers)
+    if DO_LOG_IN_BLOCK:
+        np.log10(np.maximum(powers, 1e-9), out=powers)
+    feats[:, 5:] = powers
+    return out
+
+
+def check_incremental_parity(window: np.ndarray, start: int) -> bool:
+    """Compare ei_features_incremental against generate_features for the same window."""
+    reference = ei_features_from_window(window)
+    fast = ei_features_incremental(window, start)
+    if fast.size != reference.size:
+        print(f"[PARITY] Length differs: incremental={fast.size}, EI={reference.size}")
+        return False
+    err = np.abs(fast - reference)
+    worst = int(np.argmax(err))
+    ok = bool(err[worst] <= INCREMENTAL_PARITY_ATOL)
+    axis, j = divmod(worst, _FEATS_PER_AXIS)
+    print(
+        f"[PARITY] max |incremental - EI| = {err[worst]:.3g} at feature {worst} "
+        f"({AXES[axis]}, #{j}) ({'OK' if ok else 'MISMATCH'}, atol={INCREMENTAL_PARITY_ATOL:g})"
+    )
+    return ok
+
+
 def run_inference(window: np.ndarray):
     """
     Live-mode inference: Muse window -> EI spectral features -> model output.
 
     Returns:
-        y: np.ndarray, raw model output vector
-        probs: dict[label -> float]
+        y: np.ndarray, raw model output vector (reused buffer, valid until the next call)
+        probs: tuple of Python floats in LABELS order
     """
-    feats = ei_features_from_window(window)
+    global USE_INCREMENTAL_FFT, _incremental_checked
+
+    if USE_INCREMENTAL_FFT and not _incremental_checked:
+        _incremental_checked = True
+        if not check_incremental_parity(window, _window_start):
+            print("[WARN] Incremental FFT features differ from generate_features; disabled.")
+            USE_INCREMENTAL_FFT = False
+
+    if USE_INCREMENTAL_FFT:
+        feats = ei_features_incremental(window, _window_start, out=_FEAT_BUF)
+    else:
+        feats = ei_features_from_window(window, out=_FEAT_BUF)
     if feats.size == 0:
         return None
-    y = infer(feats)
-    probs = {LABELS[i]: float(y[i]) for i in range(min(len(LABELS), len(y)))}
-    return y, probs
+    y = infer(feats, out=_Y_BUF)
+    return y, tuple(y.tolist())
 
 
 def send_decision(ser, is_target: bool):
@@ -444,26 +771,32 @@ def send_blower_pwm(link: BlowerLink | None, blower_pwm: int):
         print(f"[DEBUG] Blower PWM command => {blower_pwm} (no link)")
 
 
+# Blower PWM per class index (pls experiment yourself with the values, below an intial suggestion)
+_PWM_LUT = [0] * len(LABELS)
+_PWM_LUT[CLASS_CALM] = 200
+_PWM_LUT[CLASS_NON_CALM] = 255
+_PWM_LUT[CLASS_SLEEP] = 150
+_PWM_LUT = tuple(_PWM_LUT)
+
+
 def map_class_to_blower_pwm(pred_class: int) -> int:
     """
-    Mapping (pls experiment yourself with the values, below an intial suggestion):
-    - sleep     -> 0       (fan off)
-    - calm      -> ~50 %   -> 128
-    - non_calm  -> 100 %   -> 255
+    Mapping (pls experiment yourself with the values in _PWM_LUT):
+    - sleep     -> 150
+    - calm      -> 200
+    - non_calm  -> 255 (100 %)
+    Unknown classes -> 0 (fan off).
     """
-    if pred_class == CLASS_SLEEP:
-        return 150
-    elif pred_class == CLASS_CALM:
-        return 200
-    elif pred_class == CLASS_NON_CALM:
-        return 255
-    else:
-        return 0
+    return _PWM_LUT[pred_class] if 0 <= pred_class < len(_PWM_LUT) else 0
 
 
 # ================== EI FEATURE TEST MODES ==================
 
 
+# Integers, decimals and scientific notation (EI exports e.g. "1.2e-05"), with +/-
+_NUM_RE = re.compile(r"[-+]?(?:\d*\.\d+|\d+)(?:[eE][-+]?\d+)?")
+
+
 def parse_ei_feature_string(text: str) -> np.ndarray:
     """
     Parse a line copied from Edge Impulse into a float32 vector.
@@ -471,12 +804,11 @@ def parse_ei_feature_string(text: str) -> np.ndarray:
     Accepts comma- or space-separated values and ignores other text on the line,
     so you can paste directly from EI tables.
     """
-    # Find all numbers (handles integers and floats, with +/-)
-    nums = re.findall(r"[-+]?(?:\d*\.\d+|\d+)", text)
+    nums = _NUM_RE.findall(text)
     if not nums:
         return np.array([], dtype=np.float32)
-    arr = np.array([float(x) for x in nums], dtype=np.float32)
-    return arr
+    # Every token is a well-formed number, so NumPy's C parser reads them all in one go
+    return np.fromstring(" ".join(nums), dtype=np.float32, sep=" ")
 
 
 def test_with_ei_features(feature_text: str):
@@ -593,15 +925,19 @@ def live_loop(args):
     """
     Live Muse → EI → blower mapping loop.
 
-    Mapping (now in PWM 0–255):
-      - sleep  (class 2) -> blower 0 (0 %)
-      - calm   (class 0) -> blower 128 (~50 %)
+    Mapping (PWM 0–255, from _PWM_LUT):
+      - sleep    (class 2) -> blower 150 (~60 %)
+      - calm     (class 0) -> blower 200 (~80 %)
       - non_calm (class 1) -> blower 255 (100 %)
     Uses majority vote over the last CLASS_HISTORY_WINDOWS predicted classes.
     """
     board = None
     link: BlowerLink | None = None
-    class_history: list[int] = []
+    # Last CLASS_HISTORY_WINDOWS predictions as a fixed int8 ring: no per-stride allocation
+    class_ring = np.zeros(CLASS_HISTORY_WINDOWS, dtype=np.int8)
+    log_status = logger.isEnabledFor(logging.INFO)  # level is fixed for the session
+    ring_idx = 0
+    ring_fill = 0
     window_idx = 0
 
     try:
@@ -610,11 +946,25 @@ def live_loop(args):
         print("[INFO] Entering main EEG → blower loop.")
         print(f"[DEBUG] Backend: {BACKEND}, Input shape: {INPUT_SHAPE}")
 
+        # Absolute deadlines: a stride starts every STRIDE_SECONDS, however long the work took
+        next_tick = time.perf_counter()
+        overrun_warned = False
+
         while True:
-            window = get_eeg_window(board, WINDOW_SECONDS)
+            delay = next_tick - time.perf_counter()
+            if delay > 0.0:
+                time.sleep(delay)
+            elif window_idx > 0 and delay < 0.0:
+                # Work overran the stride: start now and re-anchor instead of bursting
+                if not overrun_warned:
+                    print(f"[WARN] Stride overrun by {-delay * 1000:.0f} ms; not sleeping.")
+                    overrun_warned = True
+                next_tick = time.perf_counter()
+            next_tick += STRIDE_SECONDS
+
+            window = get_eeg_window(board)
             if window is None:
                 print("[TRACE] Not enough data yet for full window.")
-                time.sleep(STRIDE_SECONDS)
                 window_idx += 1
                 continue
 
@@ -630,43 +980,57 @@ def live_loop(args):
 
             result = run_inference(window)
             if result is None:
-                time.sleep(STRIDE_SECONDS)
                 window_idx += 1
                 continue
 
             y, probs = result
 
             # --- Class prediction and smoothing ---
-            pred_class = int(np.argmax(y))
-            class_history.append(pred_class)
-            if len(class_history) > CLASS_HISTORY_WINDOWS:
-                class_history = class_history[-CLASS_HISTORY_WINDOWS:]
+            # Three classes: a compare chain on Python floats beats np.argmax dispatch
+            calm_p, non_calm_p, sleep_p = (
+                probs[CLASS_CALM], probs[CLASS_NON_CALM], probs[CLASS_SLEEP]
+            )
+            if calm_p >= non_calm_p and calm_p >= sleep_p:
+                pred_class = CLASS_CALM
+            elif non_calm_p >= sleep_p:
+                pred_class = CLASS_NON_CALM
+            else:
+                pred_class = CLASS_SLEEP
 
-            stable_class = Counter(class_history).most_common(1)[0][0]
+            class_ring[ring_idx] = pred_class
+            ring_idx = (ring_idx + 1) % CLASS_HISTORY_WINDOWS
+            ring_fill = min(ring_fill + 1, CLASS_HISTORY_WINDOWS)
+
+            stable_class = int(np.bincount(class_ring[:ring_fill], minlength=len(LABELS)).argmax())
 
             # --- Blower mapping (PWM) ---
             blower_pwm = map_class_to_blower_pwm(stable_class)
-            blower_percent = int(round(blower_pwm / 255.0 * 100.0))
-
-            calm_p = probs.get("calm", 0.0)
-            non_calm_p = probs.get("non_calm", 0.0)
-            sleep_p = probs.get("sleep", 0.0)
 
-            history_str = "".join(str(c) for c in class_history)
-            stable_label = LABELS[stable_class] if stable_class < len(LABELS) else "?"
-
-            print(
-                f"probs(calm={calm_p:.2f}, non_calm={non_calm_p:.2f}, sleep={sleep_p:.2f}) | "
-                f"last {len(class_history)} classes: {history_str} | "
-                f"stable_class={stable_class} ({stable_label}) | "
-                f"blower={blower_pwm}/255 (~{blower_percent} %)"
-            )
+            # Status line: strings are only built on the strides that print it
+            if log_status and window_idx % LOG_EVERY_N == 0:
+                # Oldest → newest: once the ring is full the oldest entry sits at ring_idx
+                if ring_fill < CLASS_HISTORY_WINDOWS:
+                    history = class_ring[:ring_fill].tolist()
+                else:
+                    history = class_ring[ring_idx:].tolist() + class_ring[:ring_idx].tolist()
+                logger.info(
+                    "probs(calm=%.2f, non_calm=%.2f, sleep=%.2f) | "
+                    "last %d classes: %s | stable_class=%d (%s) | blower=%d/255 (~%d %%)",
+                    calm_p,
+                    non_calm_p,
+                    sleep_p,
+                    ring_fill,
+                    "".join(map(str, history)),
+                    stable_class,
+                    LABELS[stable_class] if stable_class < len(LABELS) else "?",
+                    blower_pwm,
+                    int(round(blower_pwm / 255.0 * 100.0)),
+                )
 
             # --- Send to Photon 2 ---
             send_blower_pwm(link, blower_pwm)
 
             window_idx += 1
-            time.sleep(STRIDE_SECONDS)
 
     except BrainFlowError as e:
         print(f"[ERROR] BrainFlow error: {e}")
@@ -745,6 +1109,9 @@ def main():
 
     args = parser.parse_args()
 
+    logging.basicConfig(level=LOG_LEVEL, format="%(message)s")
+    load_model()
+
     if args.test_raw:
         test_with_raw_samples(args.test_raw)
     elif args.test_features:
@@ -6,7 +6,10 @@ import sys
 import time
 import re
 import argparse
+import functools
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import rfft
 import serial
 from serial import SerialException
 from brainflow.board_shim import (
@@ -49,26 +52,79 @@ if pb_root not in sys.path:
 
 from spectral_analysis import generate_features
 
+# pyFFTW is optional: plan the fixed-shape frame rFFT of the fast path once and reuse it
+try:
+    import pyfftw
+    PYFFTW_AVAILABLE = True
+except ImportError:
+    PYFFTW_AVAILABLE = False
+
 
 # ----------------- Model selection and setup -----------------
 MODEL_TFLITE = "EEG_float32.lite"
+# float16-weight build of the same model, preferred when present. Build it with:
+#   python convert_model.py --h5 EEG_model_64.h5 --out EEG_float16.lite --quant float16
+MODEL_TFLITE_FP16 = "EEG_float16.lite"
 MODEL_H5 = "EEG_model_64.h5"
-
-if os.path.exists(MODEL_H5):
-    from tensorflow.keras.models import load_model
-
-    model = load_model(MODEL_H5)
-    INPUT_SHAPE = (1, model.input_shape[-1])
-    EXPECTED_FEATURES = model.input_shape[-1]
-    BACKEND = "keras"
-    print(f"[INFO] Using Keras backend, model: {MODEL_H5}")
+MODEL_H5_LITE = os.path.splitext(MODEL_H5)[0] + ".lite"   # cached conversion of MODEL_H5
+
+# Alternative to TFLite: a float32 SavedModel serving signature, used when exported with
+#   python convert_model.py --h5 EEG_model_64.h5 --out saved_model --saved-model
+SAVED_MODEL_DIR = "saved_model"
+
+# An exported SavedModel wins, then an fp16 build, then the .h5, which is converted to
+# TFLite once (cached next to it, rebuilt when the .h5 is newer) so every .lite case
+# shares one Interpreter-based infer() instead of paying model.predict()'s per-call
+# pipeline overhead on a 1-row input.
+if os.path.isdir(SAVED_MODEL_DIR):
+    import tensorflow as tf
+
+    _serve = tf.saved_model.load(SAVED_MODEL_DIR).signatures["serving_default"]
+    _SERVE_IN, _serve_spec = next(iter(_serve.structured_input_signature[1].items()))
+    _SERVE_OUT = next(iter(_serve.structured_outputs))
+    INPUT_SHAPE = tuple(_serve_spec.shape)
+    EXPECTED_FEATURES = int(INPUT_SHAPE[-1])
+    MODEL_PATH = SAVED_MODEL_DIR
+    BACKEND = "saved_model"
+    print(f"[INFO] Using SavedModel backend, model: {SAVED_MODEL_DIR}")
 
     def infer(features: np.ndarray):
         # features already in EI log-spectral (and optionally scaled) space
-        x = features.reshape(1, -1).astype(np.float32)
-        return model.predict(x, verbose=0)[0]
+        x = tf.constant(features.reshape(INPUT_SHAPE), dtype=tf.float32)
+        return _serve(**{_SERVE_IN: x})[_SERVE_OUT].numpy()[0]
+
+else:
+    # An fp16 build older than MODEL_H5 predates a retrain: skip it for the fresh conversion
+    _fp16_ok = os.path.exists(MODEL_TFLITE_FP16)
+    if _fp16_ok and os.path.exists(MODEL_H5) and (
+        os.path.getmtime(MODEL_TFLITE_FP16) < os.path.getmtime(MODEL_H5)
+    ):
+        print(f"[WARN] {MODEL_TFLITE_FP16} is older than {MODEL_H5}; ignoring it. "
+              "Rebuild it with convert_model.py.")
+        _fp16_ok = False
+
+    if _fp16_ok:
+        MODEL_PATH = MODEL_TFLITE_FP16
+    elif os.path.exists(MODEL_H5):
+        if (
+            not os.path.exists(MODEL_H5_LITE)
+            or os.path.getmtime(MODEL_H5_LITE) < os.path.getmtime(MODEL_H5)
+        ):
+            from convert_model import convert  # needs full TensorFlow
+
+            print(f"[INFO] Converting {MODEL_H5} -> {MODEL_H5_LITE} ...")
+            tflite_bytes = convert(MODEL_H5, "none", None, 0)
+            with open(MODEL_H5_LITE, "wb") as f:
+                f.write(tflite_bytes)
+        MODEL_PATH = MODEL_H5_LITE
+    elif os.path.exists(MODEL_TFLITE):
+        MODEL_PATH = MODEL_TFLITE
+    else:
+        raise FileNotFoundError(
+            "No model found. Expected one of:\n"
+            f"  {SAVED_MODEL_DIR}/\n  {MODEL_TFLITE_FP16}\n  {MODEL_H5}\n  {MODEL_TFLITE}"
+        )
 
-elif os.path.exists(MODEL_TFLITE):
     try:
         from tflite_runtime.interpreter import Interpreter
         backend = "tflite-runtime"
@@ -77,25 +133,25 @@ elif os.path.exists(MODEL_TFLITE):
         Interpreter = tf.lite.Interpreter
         backend = "tensorflow.lite"
 
-    interpreter = Interpreter(model_path=MODEL_TFLITE)
+    interpreter = Interpreter(model_path=MODEL_PATH)
     interpreter.allocate_tensors()
     input_details = interpreter.get_input_details()
     output_details = interpreter.get_output_details()
     INPUT_SHAPE = input_details[0]["shape"]
     EXPECTED_FEATURES = int(np.prod(INPUT_SHAPE[1:]))
     BACKEND = backend
-    print(f"[INFO] Using TFLite backend ({backend}), model: {MODEL_TFLITE}")
+    # Callables returning live views of the tensors (valid across resize/allocate).
+    # Only the callables are kept: invoke() refuses to run while a view is referenced.
+    _in_view = interpreter.tensor(input_details[0]["index"])
+    _out_view = interpreter.tensor(output_details[0]["index"])
+    print(f"[INFO] Using TFLite backend ({backend}), model: {MODEL_PATH}")
 
     def infer(features: np.ndarray):
-        # features already in EI log-spectral (and optionally scaled) space
-        x = features.reshape(INPUT_SHAPE).astype(np.float32)
-        interpreter.set_tensor(input_details[0]["index"], x)
+        # features already in EI log-spectral (and optionally scaled) space;
+        # written straight into the input tensor instead of set_tensor/get_tensor copies
+        np.copyto(_in_view(), features.reshape(INPUT_SHAPE), casting="unsafe")
         interpreter.invoke()
-        return interpreter.get_tensor(output_details[0]["index"])[0]
-else:
-    raise FileNotFoundError(
-        f"No model file found. Expected one of:\n  {MODEL_H5}\n  {MODEL_TFLITE}"
-    )
+        return _out_view()[0].copy()
 
 
 # ================== CONFIG ==================
@@ -105,6 +161,7 @@ FS = 256.0                     # Hz
 WINDOW_SECONDS = 2.0           # window size in seconds
 STRIDE_SECONDS = 0.250         # stride between decisions
 STABILITY_WINDOWS = 4          # number of last decisions to require stable target
+INFER_BATCH = 1                # strides per interpreter.invoke(); 2 halves invoke overhead, adds one stride of latency
 SMOOTH_WINDOWS = 4             # number of last probabilities to average
 USE_MEDIAN_SMOOTH = True       # True=median smoothing, False=mean smoothing
 TARGET_THRESHOLD = 0.7
@@ -130,6 +187,18 @@ WAVELET_LEVEL = 1
 WAVELET = ""
 EXTRA_LOW_FREQ = False
 
+# Re-implementation of the EI spectral block with one batched scipy.fft call.
+# Off until the parity check on the first live window passes for your project settings.
+USE_FAST_EI_FEATURES = False
+FAST_EI_PARITY_ATOL = 1e-5
+FFT_OVERLAP_FRACTION = 0.25     # frame overlap used by the EI block when DO_FFT_OVERLAP
+
+# Optional StandardScaler in EI log-spectral space (see rebuild_scaler.py). Off: the
+# current model is trained on the EI features as-is.
+USE_SCALER = False
+SCALER_MEAN_NPY = "ei_scaler_mean.npy"
+SCALER_STD_NPY = "ei_scaler_std.npy"
+
 LABELS = ["calm", "non_calm", "sleep"]
 TARGET_CLASS_INDEX = 1
 
@@ -140,21 +209,64 @@ SERIAL_BAUD = 115200
 DEBUG_MAX_WINDOWS = 40
 DEBUG_EVERY_N = 10
 _feature_mismatch_warned = False
+_fast_parity_checked = False
+
+# Board constants, filled once by init_board() instead of queried every window
+EEG_CHANNELS: list[int] = []
+SAMPLING_RATE = 0
+NEEDED_SAMPLES = 0
+_window_f32 = None  # reused (channels, NEEDED_SAMPLES) float32 window returned by get_eeg_window
+
+
+# ---- batched inference (TFLite only; the SavedModel signature is fixed at batch 1) ----
+if INFER_BATCH > 1 and BACKEND != "saved_model":
+    interpreter.resize_tensor_input(input_details[0]["index"], [INFER_BATCH, EXPECTED_FEATURES])
+    interpreter.allocate_tensors()
+    print(f"[INFO] TFLite input resized to batch {INFER_BATCH}.")
+_batch_rows = np.empty((INFER_BATCH, EXPECTED_FEATURES), dtype=np.float32)
+_batch_fill = 0
+
+
+def infer_batch(rows: np.ndarray) -> np.ndarray:
+    """(INFER_BATCH, features) -> (INFER_BATCH, classes) in one invoke where possible."""
+    if BACKEND == "saved_model" or INFER_BATCH == 1:
+        return np.stack([infer(r) for r in rows])
+    np.copyto(_in_view(), rows, casting="unsafe")
+    interpreter.invoke()
+    return _out_view().copy()
+
+
+# ---- scaler (loaded once, applied in place on the feature buffer) ----
+MEAN = None
+STD_SAFE = None
+if USE_SCALER:
+    MEAN = np.ascontiguousarray(np.load(SCALER_MEAN_NPY), dtype=np.float32)
+    STD_SAFE = np.ascontiguousarray(np.load(SCALER_STD_NPY), dtype=np.float32)
+    STD_SAFE[STD_SAFE == 0.0] = 1.0
+    if MEAN.size != EXPECTED_FEATURES or STD_SAFE.size != EXPECTED_FEATURES:
+        raise ValueError(
+            f"Scaler length {MEAN.size}/{STD_SAFE.size} != model features {EXPECTED_FEATURES}"
+        )
+    print(f"[INFO] Scaler loaded: {MEAN.size} features")
 
 
 # ================== HELPERS ==================
 
 
 def init_board() -> BoardShim:
+    global EEG_CHANNELS, SAMPLING_RATE, NEEDED_SAMPLES, _window_f32
+
     BoardShim.enable_dev_board_logger()
     params = BrainFlowInputParams()
     print("[INFO] Preparing Muse / BrainFlow session...")
     board = BoardShim(BOARD_ID, params)
     board.prepare_session()
     board.start_stream(45000)
-    eeg_channels = BoardShim.get_eeg_channels(BOARD_ID)
-    fs = BoardShim.get_sampling_rate(BOARD_ID)
-    print(f"[INFO] EEG channels: {eeg_channels}, sampling rate: {fs} Hz")
+    EEG_CHANNELS = BoardShim.get_eeg_channels(BOARD_ID)
+    SAMPLING_RATE = BoardShim.get_sampling_rate(BOARD_ID)
+    NEEDED_SAMPLES = int(WINDOW_SECONDS * SAMPLING_RATE)
+    _window_f32 = np.empty((len(EEG_CHANNELS), NEEDED_SAMPLES), dtype=np.float32)
+    print(f"[INFO] EEG channels: {EEG_CHANNELS}, sampling rate: {SAMPLING_RATE} Hz")
     time.sleep(1.0)
     return board
 
@@ -173,52 +285,216 @@ def init_serial():
         return None
 
 
-def get_eeg_window(board: BoardShim, window_sec: float) -> np.ndarray | None:
-    fs = BoardShim.get_sampling_rate(BOARD_ID)
-    needed = int(window_sec * fs)
-    data = board.get_current_board_data(needed)
-    if data.shape[1] < needed:
+def get_eeg_window(board: BoardShim) -> np.ndarray | None:
+    """
+    Newest NEEDED_SAMPLES of the EEG channels as a reused float32 (channels, n)
+    buffer (valid until the next call): channel gather and cast in one np.take.
+    """
+    data = board.get_current_board_data(NEEDED_SAMPLES)
+    if data.shape[1] < NEEDED_SAMPLES:
         return None
-    eeg_channels = BoardShim.get_eeg_channels(BOARD_ID)
-    window = data[eeg_channels, -needed:]
-    return window
+    np.take(data[:, -NEEDED_SAMPLES:], EEG_CHANNELS, axis=0, out=_window_f32)
+    return _window_f32
+
+
+def _window_stats(window: np.ndarray):
+    """
+    Per-channel min, max, mean and std (ddof=0) of a (channels, n) window for the
+    debug print: each is one reduction over all channels, mean/std from float64
+    sums of the samples shifted by each channel's first one (Muse samples carry a
+    large DC offset; unshifted sumsq/n - mean^2 would cancel to 0).
+    """
+    n = window.shape[1]
+    d = window - window[:, :1]
+    s = d.sum(axis=1, dtype=np.float64)
+    sq = np.einsum("ij,ij->i", d, d, dtype=np.float64)
+    mean = window[:, 0] + s / n
+    std = np.sqrt(np.maximum(sq / n - (s / n) ** 2, 0.0))
+    return window.min(axis=1), window.max(axis=1), mean, std
+
+
+class EISpectralFeatures:
+    """
+    generate_features specialised to this project's fixed DSP config.
+
+    The config arguments are bound once, and the interleaved float32 input and the
+    feature output live in buffers reused every stride (the returned array is one
+    of them: valid until the next call). The EI block itself is left untouched.
+    """
+
+    def __init__(self, n_samples: int, n_features: int):
+        self._generate = functools.partial(
+            generate_features,
+            implementation_version=IMPLEMENTATION_VERSION,
+            draw_graphs=DRAW_GRAPHS,
+            axes=AXES,
+            sampling_freq=FS,
+            scale_axes=SCALE_AXES,
+            input_decimation_ratio=INPUT_DECIMATION_RATIO,
+            filter_type=FILTER_TYPE,
+            filter_cutoff=FILTER_CUTOFF,
+            filter_order=FILTER_ORDER,
+            analysis_type=ANALYSIS_TYPE,
+            fft_length=FFT_LENGTH,
+            spectral_peaks_count=SPECTRAL_PEAKS_COUNT,
+            spectral_peaks_threshold=SPECTRAL_PEAKS_THRESHOLD,
+            spectral_power_edges=SPECTRAL_POWER_EDGES,
+            do_log=DO_LOG_IN_BLOCK,         # now True – same as in EI training
+            do_fft_overlap=DO_FFT_OVERLAP,
+            wavelet_level=WAVELET_LEVEL,
+            wavelet=WAVELET,
+            extra_low_freq=EXTRA_LOW_FREQ,
+        )
+        self.raw = np.empty((n_samples, len(AXES)), dtype=np.float32)
+        self.feats = np.empty(n_features, dtype=np.float32)
+
+    def __call__(self, window: np.ndarray) -> np.ndarray:
+        """(axes, n) window -> feature vector; length may differ from n_features."""
+        ch, n = window.shape
+        # EI DSP expects interleaved samples per axis in row-major order:
+        # one strided cast+copy into the reusable buffer instead of transpose/astype/flatten
+        if (n, ch) == self.raw.shape:
+            np.copyto(self.raw, window.T, casting="unsafe")
+            raw_data = self.raw.reshape(-1)
+        else:
+            raw_data = np.ascontiguousarray(window.T, dtype=np.float32).ravel()
+
+        values = self._generate(raw_data=raw_data)["features"]
+        if len(values) != self.feats.size:
+            return np.asarray(values, dtype=np.float32)
+        self.feats[:] = values
+        return self.feats
+
+
+_ei_spectral = EISpectralFeatures(int(WINDOW_SECONDS * FS), EXPECTED_FEATURES)
+
+
+# ================== FAST EI FEATURES ==================
+#
+# Per axis, mirroring the EI spectral block (FFT analysis, no filter):
+#   RMS, skewness, kurtosis of the demeaned signal,
+#   skewness and kurtosis of the spectrum,
+#   max-hold power spectrum |X|^2 / FFT_LENGTH over (overlapping) frames,
+#   DC bin dropped unless EXTRA_LOW_FREQ, optionally log10'd.
+# All (axis, frame) pairs go through a single pocketfft call instead of a loop per axis.
+
+_FFT_HOP = FFT_LENGTH - (int(FFT_LENGTH * FFT_OVERLAP_FRACTION) if DO_FFT_OVERLAP else 0)
+_FIRST_BIN = 0 if EXTRA_LOW_FREQ else 1
+_FEATS_PER_AXIS = 5 + (FFT_LENGTH // 2 + 1 - _FIRST_BIN)
+
+
+def _frame_geometry(n: int):
+    """Number of max-hold frames and zero-padded length for an n-sample axis."""
+    n_frames = -(-n // _FFT_HOP)
+    return n_frames, (n_frames - 1) * _FFT_HOP + FFT_LENGTH
+
+
+# Zero-padded scratch and output for the live window length, allocated once
+_WINDOW_SAMPLES = int(WINDOW_SECONDS * FS)
+_N_FRAMES, _PAD_LEN = _frame_geometry(_WINDOW_SAMPLES)
+_PAD_BUF = np.zeros((len(AXES), _PAD_LEN))
+_FAST_FEATS = np.empty(len(AXES) * _FEATS_PER_AXIS, dtype=np.float32)
+
+# FFT_LENGTH and the frame count are fixed for the live window, so with pyFFTW one
+# FFTW_MEASURE plan specialised to exactly that (axes, frames, FFT_LENGTH) shape is made
+# at import. Planning overwrites the buffers, which are only filled afterwards.
+if PYFFTW_AVAILABLE:
+    _FFT_IN = pyfftw.empty_aligned((len(AXES), _N_FRAMES, FFT_LENGTH), dtype="float64")
+    _FFT_OUT = pyfftw.empty_aligned((len(AXES), _N_FRAMES, FFT_LENGTH // 2 + 1), dtype="complex128")
+    _FFT_PLAN = pyfftw.FFTW(
+        _FFT_IN,
+        _FFT_OUT,
+        axes=(-1,),
+        flags=("FFTW_MEASURE", "FFTW_DESTROY_INPUT"),
+    )
+
+
+def _moments_np(v: np.ndarray):
+    """Row-wise biased skewness and (Fisher) kurtosis, like scipy.stats defaults."""
+    d = v - v.mean(axis=1, keepdims=True)
+    d2 = d * d
+    m2 = d2.mean(axis=1)
+    m3 = (d2 * d).mean(axis=1)
+    m4 = (d2 * d2).mean(axis=1)
+    safe = np.where(m2 > 0.0, m2, 1.0)
+    skew = np.where(m2 > 0.0, m3 / safe ** 1.5, 0.0)
+    kurt = np.where(m2 > 0.0, m4 / (safe * safe) - 3.0, -3.0)
+    return skew, kurt
+
+
+def ei_features_fast(window: np.ndarray) -> np.ndarray:
+    """
+    EI-compatible features from a (axes, N) window without generate_features.
+    The live window length writes into a reused buffer (valid until the next call).
+    """
+    n_ax, n = window.shape
+    live = (n_ax, n) == (len(AXES), _WINDOW_SAMPLES)
+    if live:
+        padded = _PAD_BUF   # tail beyond n is never written, so it stays zero
+        out = _FAST_FEATS
+    else:
+        padded = np.zeros((n_ax, _frame_geometry(n)[1]))
+        out = np.empty(n_ax * _FEATS_PER_AXIS, dtype=np.float32)
+
+    fx = padded[:, :n]
+    np.subtract(window, window.mean(axis=1, keepdims=True), out=fx)
+    fx *= SCALE_AXES
+    feats = out.reshape(n_ax, _FEATS_PER_AXIS)
+
+    feats[:, 0] = np.sqrt(np.mean(fx * fx, axis=1))
+    feats[:, 1], feats[:, 2] = _moments_np(fx)
+
+    # Max-hold power spectrum: every (axis, frame) of the zero-padded signal in one rfft
+    frames = sliding_window_view(padded, FFT_LENGTH, axis=-1)[:, ::_FFT_HOP, :]
+    if live and PYFFTW_AVAILABLE:
+        np.copyto(_FFT_IN, frames)
+        _FFT_PLAN.execute()
+        spec = _FFT_OUT
+    else:
+        spec = rfft(frames, axis=-1, workers=-1)        # (axes, frames, bins)
+    power = spec.real * spec.real
+    power += spec.imag * spec.imag
+    powers = power.max(axis=1)[:, _FIRST_BIN:] / FFT_LENGTH
+
+    feats[:, 3], feats[:, 4] = _moments_np(powers)
+    if DO_LOG_IN_BLOCK:
+        np.log10(np.maximum(powers, 1e-9), out=powers)
+    feats[:, 5:] = powers
+    return out
+
+
+def check_fast_feature_parity(window: np.ndarray, reference: np.ndarray) -> bool:
+    """Compare the fast path against generate_features output for the same window."""
+    fast = ei_features_fast(window)
+    if fast.size != reference.size:
+        print(f"[PARITY] Length differs: fast={fast.size}, EI={reference.size}")
+        return False
+    err = np.abs(fast - reference)
+    worst = int(np.argmax(err))
+    ok = bool(err[worst] <= FAST_EI_PARITY_ATOL)
+    axis, j = divmod(worst, _FEATS_PER_AXIS)
+    print(
+        f"[PARITY] max |fast - EI| = {err[worst]:.3g} at feature {worst} ({AXES[axis]}, #{j}) "
+        f"({'OK' if ok else 'MISMATCH'}, atol={FAST_EI_PARITY_ATOL:g})"
+    )
+    return ok
 
 
 def ei_features_from_window(window: np.ndarray) -> np.ndarray:
     """Compute EI spectral features (including log power inside the block)."""
-    global _feature_mismatch_warned
+    global _feature_mismatch_warned, _fast_parity_checked, USE_FAST_EI_FEATURES
 
     ch, n = window.shape
     if ch != len(AXES):
         raise ValueError(f"Expected {len(AXES)} channels, got {ch}")
 
-    # EI DSP expects interleaved samples per axis in row-major order
-    raw_data = window.T.astype(np.float32).flatten()
-
-    out = generate_features(
-        IMPLEMENTATION_VERSION,
-        DRAW_GRAPHS,
-        raw_data,
-        AXES,
-        FS,
-        SCALE_AXES,
-        INPUT_DECIMATION_RATIO,
-        FILTER_TYPE,
-        FILTER_CUTOFF,
-        FILTER_ORDER,
-        ANALYSIS_TYPE,
-        FFT_LENGTH,
-        SPECTRAL_PEAKS_COUNT,
-        SPECTRAL_PEAKS_THRESHOLD,
-        SPECTRAL_POWER_EDGES,
-        DO_LOG_IN_BLOCK,        # now True – same as in EI training
-        DO_FFT_OVERLAP,
-        WAVELET_LEVEL,
-        WAVELET,
-        EXTRA_LOW_FREQ,
-    )
+    if USE_FAST_EI_FEATURES and not _fast_parity_checked:
+        _fast_parity_checked = True
+        if not check_fast_feature_parity(window, _ei_spectral(window)):
+            print("[WARN] Fast EI features differ from generate_features; disabled.")
+            USE_FAST_EI_FEATURES = False
 
-    feats = np.asarray(out["features"], dtype=np.float32)
+    feats = ei_features_fast(window) if USE_FAST_EI_FEATURES else _ei_spectral(window)
 
     if feats.size != EXPECTED_FEATURES:
         if not _feature_mismatch_warned:
@@ -228,17 +504,36 @@ def ei_features_from_window(window: np.ndarray) -> np.ndarray:
             _feature_mismatch_warned = True
         return np.array([], dtype=np.float32)
 
+    if USE_SCALER:
+        # (x - μ) / σ without temporaries: feats is a reused float32 buffer
+        np.subtract(feats, MEAN, out=feats)
+        np.divide(feats, STD_SAFE, out=feats)
+
     return feats
 
 
 def run_inference(window: np.ndarray):
+    """
+    Queue the window's features for inference. Returns None on a feature error,
+    [] while the batch is still filling, else one (p_target, y) per queued
+    window, oldest first (a single entry when INFER_BATCH == 1). y is the raw
+    class probability vector in LABELS order.
+    """
+    global _batch_fill
+
     feats = ei_features_from_window(window)
     if feats.size == 0:
         return None
-    y = infer(feats)
-    probs = {LABELS[i]: float(y[i]) for i in range(min(len(LABELS), len(y)))}
-    p_target = probs.get(LABELS[TARGET_CLASS_INDEX], float(max(y)))
-    return p_target, probs
+    if INFER_BATCH == 1:
+        y = infer(feats)
+        return [(float(y[TARGET_CLASS_INDEX]), y)]
+
+    _batch_rows[_batch_fill] = feats
+    _batch_fill += 1
+    if _batch_fill < INFER_BATCH:
+        return []
+    _batch_fill = 0
+    return [(float(y[TARGET_CLASS_INDEX]), y) for y in infer_batch(_batch_rows)]
 
 
 def send_decision(ser, is_target: bool):
@@ -255,6 +550,10 @@ def send_decision(ser, is_target: bool):
 # ================== EI FEATURE TEST MODE ==================
 
 
+# Integers, decimals and scientific notation (EI exports e.g. "1.2e-05"), with +/-
+_NUM_RE = re.compile(r"[-+]?(?:\d*\.\d+|\d+)(?:[eE][-+]?\d+)?")
+
+
 def parse_ei_feature_string(text: str) -> np.ndarray:
     """
     Parse a line copied from Edge Impulse "features" into a float32 vector.
@@ -262,12 +561,11 @@ def parse_ei_feature_string(text: str) -> np.ndarray:
     Accepts comma- or space-separated values and ignores other text on the line,
     so you can paste directly from EI tables.
     """
-    # Find all numbers (handles integers and floats, with +/-)
-    nums = re.findall(r"[-+]?(?:\d*\.\d+|\d+)", text)
+    nums = _NUM_RE.findall(text)
     if not nums:
         return np.array([], dtype=np.float32)
-    arr = np.array([float(x) for x in nums], dtype=np.float32)
-    return arr
+    # Every token is a well-formed number, so NumPy's C parser reads them all in one go
+    return np.fromstring(" ".join(nums), dtype=np.float32, sep=" ")
 
 
 def test_with_ei_features(feature_text: str):
@@ -292,16 +590,14 @@ def test_with_ei_features(feature_text: str):
 
     y = infer(feats)
 
-    # Map to labels if possible
-    probs = {LABELS[i]: float(y[i]) for i in range(min(len(LABELS), len(y)))}
-    # Also show raw vector for sanity
+    # Show raw vector for sanity
     print("[TEST] Raw model output vector:")
     for i, p in enumerate(y):
         label = LABELS[i] if i < len(LABELS) else f"class_{i}"
         print(f"  {i}: {label:9s} -> {p:.6f}")
 
     # Target probability (same logic as live code)
-    p_target = probs.get(LABELS[TARGET_CLASS_INDEX], float(max(y)))
+    p_target = float(y[TARGET_CLASS_INDEX])
     print(f"[TEST] Target class index: {TARGET_CLASS_INDEX} ({LABELS[TARGET_CLASS_INDEX]})")
     print(f"[TEST] p_target = {p_target:.6f}")
     print(f"[TEST] Decision at threshold {TARGET_THRESHOLD:.3f}: "
@@ -320,8 +616,13 @@ def live_loop():
     """Original live Muse→EI→decision loop."""
     board = None
     ser = None
-    decisions: list[bool] = []
-    prob_buffer: list[float] = []
+    # Fixed-size rings (write index + fill count) instead of re-sliced Python lists
+    prob_ring = np.zeros(SMOOTH_WINDOWS, dtype=np.float64)
+    prob_idx = 0
+    prob_fill = 0
+    decision_ring = np.zeros(STABILITY_WINDOWS, dtype=np.uint8)
+    decision_idx = 0
+    decision_fill = 0
     window_idx = 0
 
     try:
@@ -330,61 +631,79 @@ def live_loop():
         print("[INFO] Entering main EEG → decision loop.")
         print(f"[DEBUG] Backend: {BACKEND}, Input shape: {INPUT_SHAPE}")
 
+        # Monotonic deadlines: a stride starts every STRIDE_SECONDS, whatever the work took
+        next_t = time.monotonic()
+
         while True:
-            window = get_eeg_window(board, WINDOW_SECONDS)
+            dt = next_t - time.monotonic()
+            if dt > 0.0:
+                time.sleep(dt)
+            elif dt < -STRIDE_SECONDS:
+                next_t = time.monotonic()  # more than a stride behind: re-anchor, don't burst
+            # (slightly late: no sleep, the next strides catch up)
+            next_t += STRIDE_SECONDS
+
+            window = get_eeg_window(board)
             if window is None:
                 print("[TRACE] Not enough data yet for full window.")
-                time.sleep(STRIDE_SECONDS)
                 window_idx += 1
                 continue
 
-            if window_idx < DEBUG_MAX_WINDOWS and (window_idx % DEBUG_EVERY_N == 0):
-                ch, n = window.shape
+            # __debug__ is False under python -O, which drops this block entirely
+            if __debug__ and window_idx < DEBUG_MAX_WINDOWS and (window_idx % DEBUG_EVERY_N == 0):
                 print(f"[DEBUG] Window {window_idx}: shape={window.shape}")
-                for c in range(ch):
-                    w = window[c]
+                stats = zip(*(v.tolist() for v in _window_stats(window)))
+                for c, (w_min, w_max, w_mean, w_std) in enumerate(stats):
                     print(
-                        f"[DEBUG]  ch{c}: min={w.min():.3f}, max={w.max():.3f}, "
-                        f"mean={w.mean():.3f}, std={w.std():.3f}"
+                        f"[DEBUG]  ch{c}: min={w_min:.3f}, max={w_max:.3f}, "
+                        f"mean={w_mean:.3f}, std={w_std:.3f}"
                     )
 
-            result = run_inference(window)
-            if result is None:
-                time.sleep(STRIDE_SECONDS)
+            results = run_inference(window)
+            if not results:
+                # feature error, or waiting for the rest of an INFER_BATCH
                 window_idx += 1
                 continue
 
-            p_target, probs = result
-            prob_buffer.append(p_target)
-            if len(prob_buffer) > SMOOTH_WINDOWS:
-                prob_buffer = prob_buffer[-SMOOTH_WINDOWS:]
-
-            # --- Smoothing ---
-            if USE_MEDIAN_SMOOTH:
-                p_smoothed = float(np.median(prob_buffer))
+            # Each batched window goes through smoothing/stability in stride order
+            for p_target, y in results:
+                prob_ring[prob_idx] = p_target
+                prob_idx = (prob_idx + 1) % SMOOTH_WINDOWS
+                prob_fill = min(prob_fill + 1, SMOOTH_WINDOWS)
+
+                # --- Smoothing ---
+                if USE_MEDIAN_SMOOTH:
+                    # A handful of values: sorting a Python list beats np.median's overhead
+                    vals = sorted(prob_ring[:prob_fill].tolist())
+                    mid = prob_fill // 2
+                    p_smoothed = vals[mid] if prob_fill % 2 else 0.5 * (vals[mid - 1] + vals[mid])
+                else:
+                    p_smoothed = float(prob_ring[:prob_fill].mean())
+
+                is_target = p_smoothed >= TARGET_THRESHOLD
+                decision_ring[decision_idx] = is_target
+                decision_idx = (decision_idx + 1) % STABILITY_WINDOWS
+                decision_fill = min(decision_fill + 1, STABILITY_WINDOWS)
+            stable_target = bool(decision_ring[:decision_fill].all())
+
+            # Fixed 3-class model, outputs in LABELS order: calm, non_calm, sleep
+            calm_p, non_calm_p, sleep_p = y.tolist()
+
+            # Oldest → newest: once the ring is full the oldest entry sits at decision_idx
+            if decision_fill < STABILITY_WINDOWS:
+                decisions = decision_ring[:decision_fill].tolist()
             else:
-                p_smoothed = float(np.mean(prob_buffer))
-
-            is_target = p_smoothed >= TARGET_THRESHOLD
-            decisions.append(is_target)
-            if len(decisions) > STABILITY_WINDOWS:
-                decisions = decisions[-STABILITY_WINDOWS:]
-            stable_target = all(decisions)
-
-            calm_p = probs.get("calm", 0.0)
-            non_calm_p = probs.get("non_calm", 0.0)
-            sleep_p = probs.get("sleep", 0.0)
+                decisions = decision_ring[decision_idx:].tolist() + decision_ring[:decision_idx].tolist()
 
             print(
                 f"p_target={p_smoothed:.3f} "
                 f"(calm={calm_p:.2f}, non_calm={non_calm_p:.2f}, sleep={sleep_p:.2f}) | "
-                f"last {len(decisions)}: {''.join('T' if d else 'N' for d in decisions)} | "
+                f"last {decision_fill}: {''.join('T' if d else 'N' for d in decisions)} | "
                 f"stable_target={stable_target}"
             )
 
             send_decision(ser, stable_target)
             window_idx += 1
-            time.sleep(STRIDE_SECONDS)
 
     except BrainFlowError as e:
         print(f"[ERROR] BrainFlow error: {e}")
@@ -4,19 +4,25 @@
 import numpy as np
 from pathlib import Path
 
+from log_space import mean_std
+
 # point these to the files you downloaded from EI's Dashboard → Data exports
 train_npy = Path("src/training.npy")
 test_npy  = Path("src/testing.npy")  # not needed for scaling, but can inspect
 
-# --- Load feature arrays
-X_train = np.load(train_npy)
-X_test  = np.load(test_npy)
+# --- Load feature arrays (memory-mapped: only reduced below, so pages are read on demand)
+X_train = np.load(train_npy, mmap_mode="r")
+X_test  = np.load(test_npy, mmap_mode="r")
 
 print(f"Training shape: {X_train.shape}, Testing shape: {X_test.shape}")
 
 # --- Compute per-feature mean and std (population std, same as scikit-learn's transform)
-mean = X_train.mean(axis=0).astype(np.float32)
-std  = X_train.std(axis=0, ddof=0).astype(np.float32)
+# One chunked pass with shifted float64 sums (same kernel as rebuild_scaler.py's log-space
+# stats) instead of mean() + std(), which would traverse X_train again and materialise
+# the centred copy.
+mean64, std64 = mean_std(X_train)
+mean = mean64.astype(np.float32)
+std  = std64.astype(np.float32)
 
 # --- Safety check: zero-variance features
 std_safe = np.where(std == 0.0, 1.0, std)
@@ -0,0 +1,132 @@
+# Convert a Keras .h5 EEG classifier to TFLite, optionally with post-training float16/int8 quantization.
+# Representative data is an .npy of feature rows in the *same space* the live script feeds the model.
+
+import argparse
+import numpy as np
+import tensorflow as tf
+
+
+def representative_dataset(calib_npy: str, num_samples: int):
+    """Yield single feature rows from an .npy file for int8 calibration."""
+    X = np.load(calib_npy).astype(np.float32)
+    if X.ndim != 2:
+        raise ValueError(f"Expected 2D calibration array (rows x features), got {X.shape}")
+
+    def gen():
+        for row in X[:num_samples]:
+            yield [row.reshape(1, -1)]
+
+    return gen
+
+
+def convert(
+    h5_path: str,
+    quant: str,
+    calib_npy: str | None,
+    num_samples: int,
+    io_type: str = "int8",
+) -> bytes:
+    model = tf.keras.models.load_model(h5_path)
+    print(f"[INFO] Loaded {h5_path}, input shape: {model.input_shape}")
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if quant == "float16":
+        # float16 weights (half the size and weight traffic), float32 activations/IO;
+        # the CPU kernels dequantize the weights on load, so accuracy is essentially unchanged
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quant == "dynamic":
+        # Dynamic-range quantization: int8 weights, float activations/IO, no calibration data
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quant == "int8":
+        if calib_npy is None:
+            raise ValueError("--calib is required for int8 quantization")
+        # Full-integer model: int8 weights and activations. With io_type="float32" the
+        # converter adds quantize/dequantize ops at the edges, so callers keep float I/O.
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(calib_npy, num_samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        io_dtype = tf.int8 if io_type == "int8" else tf.float32
+        converter.inference_input_type = io_dtype
+        converter.inference_output_type = io_dtype
+
+    return converter.convert()
+
+
+def export_saved_model(h5_path: str, out_dir: str) -> None:
+    """
+    Export the .h5 as a SavedModel whose only signature is a traced float32
+    (1, features) forward pass. Loading it skips Keras and the optimizer state.
+    """
+    model = tf.keras.models.load_model(h5_path)
+    n_features = model.input_shape[-1]
+    print(f"[INFO] Loaded {h5_path}, input shape: {model.input_shape}")
+
+    serve = tf.function(
+        lambda x: model(x, training=False),
+        input_signature=[tf.TensorSpec((1, n_features), tf.float32, name="x")],
+    )
+    tf.saved_model.save(
+        model, out_dir, signatures={"serving_default": serve.get_concrete_function()}
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Convert a Keras .h5 model to TFLite (float32, float16, dynamic-range or int8 quantized)."
+        )
+    )
+    parser.add_argument("--h5", required=True, help="Keras model to convert, e.g. EEG_model_64.h5")
+    parser.add_argument(
+        "--out",
+        required=True,
+        help="Output .lite file, e.g. EEG_int8.lite (a directory with --saved-model).",
+    )
+    parser.add_argument(
+        "--quant",
+        choices=["none", "float16", "dynamic", "int8"],
+        default="int8",
+        help=(
+            "Post-training quantization: none, float16 (fp16 weights), "
+            "dynamic (int8 weights only) or int8 (default)."
+        ),
+    )
+    parser.add_argument(
+        "--calib",
+        default=None,
+        help="Feature rows (.npy, rows x features) used as int8 representative dataset.",
+    )
+    parser.add_argument(
+        "--num-samples",
+        type=int,
+        default=200,
+        help="Number of calibration rows to use (default 200).",
+    )
+    parser.add_argument(
+        "--io-type",
+        choices=["int8", "float32"],
+        default="int8",
+        help="Input/output tensor type of an int8 model (default int8; float32 keeps float I/O).",
+    )
+    parser.add_argument(
+        "--saved-model",
+        action="store_true",
+        help="Export a float32 SavedModel serving signature to --out instead of TFLite.",
+    )
+    args = parser.parse_args()
+
+    if args.saved_model:
+        export_saved_model(args.h5, args.out)
+        print(f"[INFO] Wrote SavedModel to {args.out}")
+        return
+
+    tflite_bytes = convert(args.h5, args.quant, args.calib, args.num_samples, args.io_type)
+    with open(args.out, "wb") as f:
+        f.write(tflite_bytes)
+    print(f"[INFO] Wrote {args.out} ({len(tflite_bytes)} bytes, quant={args.quant})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# log10(max(x, eps)) and per-column mean/std for the EI scaler scripts, in one pass without
+# temporaries. Shared by Extract_scaling_vectors.py, rebuild_scaler.py and test_log10_space.py
+# so all of them use the same kernels, numerics and EPS handling.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Numba is optional: without it the same result comes from two in-place NumPy ufuncs
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+
+    @njit(cache=True)
+    def _log10_clip_flat(x, eps, out):
+        for i in range(x.size):
+            v = x[i]
+            if v < eps:  # NaN compares False and stays NaN, like np.maximum
+                v = eps
+            out[i] = np.log10(v)
+
+
+def log10_clip(x: np.ndarray, eps: float, out: np.ndarray | None = None) -> np.ndarray:
+    """Return log10(max(x, eps)) with x's float dtype; `out` may be x itself."""
+    x = np.ascontiguousarray(x)
+    if not np.issubdtype(x.dtype, np.floating):
+        x = x.astype(np.float64)
+    if out is None:
+        out = np.empty_like(x)
+    if NUMBA_AVAILABLE:
+        if out.flags.c_contiguous:
+            _log10_clip_flat(x.reshape(-1), eps, out.reshape(-1))
+        else:
+            # reshape(-1) of a strided `out` would be a copy and drop the result
+            tmp = np.empty(x.shape, dtype=out.dtype)
+            _log10_clip_flat(x.reshape(-1), eps, tmp.reshape(-1))
+            np.copyto(out, tmp)
+    else:
+        np.maximum(x, eps, out=out)
+        np.log10(out, out=out)
+    return out
+
+
+_CHUNK_ROWS = 1024  # rows per scratch chunk (~2 MB at 532 float32 features)
+
+
+def _block_moments(x: np.ndarray, eps: float | None, lo: int, hi: int):
+    """
+    (count, mean, M2) per column of x[lo:hi], or of log10(max(x[lo:hi], eps))
+    when eps is given. Rows are read in order, a chunk at a time through one
+    scratch buffer with the SIMD NumPy ufuncs; values are shifted by the block's
+    first row so the float64 sums stay small (no sumsq/n - mean^2 cancellation).
+    """
+    m = x.shape[1]
+    buf = np.empty((min(_CHUNK_ROWS, hi - lo), m), dtype=np.result_type(x.dtype, np.float32))
+    if eps is None:
+        shift = np.array(x[lo], dtype=buf.dtype)
+    else:
+        shift = np.log10(np.maximum(x[lo], eps)).astype(buf.dtype)
+    s = np.zeros(m)
+    sq = np.zeros(m)
+    for i in range(lo, hi, _CHUNK_ROWS):
+        c = buf[:min(_CHUNK_ROWS, hi - i)]
+        if eps is None:
+            np.copyto(c, x[i:i + c.shape[0]])
+        else:
+            np.maximum(x[i:i + c.shape[0]], eps, out=c)
+            np.log10(c, out=c)
+        c -= shift
+        s += c.sum(axis=0, dtype=np.float64)
+        sq += np.einsum("ij,ij->j", c, c, dtype=np.float64)
+    n = hi - lo
+    return n, shift + s / n, sq - s * s / n
+
+
+def log10_mean_std(x: np.ndarray, eps: float, workers: int | None = None):
+    """
+    Per-column mean and population std (ddof=0) of log10(max(x, eps)) for a
+    (rows, features) array, without materialising the log10 array.
+    Returns two float64 vectors.
+    """
+    return _mean_std(x, eps, workers)
+
+
+def mean_std(x: np.ndarray, workers: int | None = None):
+    """Per-column mean and population std (ddof=0) of x; two float64 vectors."""
+    return _mean_std(x, None, workers)
+
+
+def _mean_std(x: np.ndarray, eps: float | None, workers: int | None):
+    # Blocks of rows go to `workers` threads (the ufuncs release the GIL), each
+    # with its own float64 partials, merged with Chan's pairwise update.
+    x = np.asarray(x)
+    if x.ndim != 2:
+        raise ValueError(f"Expected 2D array (rows x features), got {x.shape}")
+    n = x.shape[0]
+    if n == 0:
+        raise ValueError("Expected at least one row")
+    workers = max(1, min(workers or os.cpu_count() or 1, -(-n // _CHUNK_ROWS)))
+    step = -(-n // workers)
+    bounds = [(lo, min(n, lo + step)) for lo in range(0, n, step)]
+    if len(bounds) == 1:
+        parts = [_block_moments(x, eps, 0, n)]
+    else:
+        with ThreadPoolExecutor(len(bounds)) as pool:
+            parts = list(pool.map(lambda b: _block_moments(x, eps, *b), bounds))
+
+    n_a, mean, m2 = parts[0]
+    for n_b, mean_b, m2_b in parts[1:]:
+        n_ab = n_a + n_b
+        d = mean_b - mean
+        mean = mean + d * (n_b / n_ab)
+        m2 = m2 + m2_b + d * d * (n_a * n_b / n_ab)
+        n_a = n_ab
+    return mean, np.sqrt(np.maximum(m2, 0.0) / n)
@@ -3,14 +3,18 @@
 
 import numpy as np
 
-Xtr = np.load("src/training.npy").astype(np.float32)
+from log_space import log10_mean_std
+
+# Memory-mapped and in its stored dtype: the kernel only reads it, so no full float32 copy
+Xtr = np.load("src/training.npy", mmap_mode="r")
 
 # Use the SAME epsilon as your runtime DSP (keep this consistent!)
 EPS = 1e-12
-Xsrc = np.log10(np.maximum(Xtr, EPS))
+# log10 clip, mean and std fused into one pass over Xtr (float64 accumulation)
+mean, std = log10_mean_std(Xtr, EPS)
 
-mean = Xsrc.mean(axis=0).astype(np.float32)
-std  = Xsrc.std(axis=0, ddof=0).astype(np.float32)
+mean = mean.astype(np.float32)
+std  = std.astype(np.float32)
 std_safe = np.where(std == 0.0, 1.0, std)
 
 np.save("ei_scaler_mean.npy", mean)